@@ -0,0 +1,184 @@
+import re
+from dataclasses import dataclass, field
+from html import unescape
+from typing import List, Optional, Tuple
+from urllib.parse import unquote_plus
+
+# Title cleaning, compiled once
+_HTML_ENTITY = re.compile(r'&[a-z]+;')  # leftover entities like &nbsp;
+# Chinese, Japanese hiragana/katakana and Arabic runs
+_FOREIGN_SCRIPT = re.compile(r'[\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff\u0600-\u06ff]+')
+_EDGE_PUNCTUATION = re.compile(r'^[\W_]+|[\W_]+$')
+
+# Title pass: one compiled finditer steps from "<" to "<" straight to the
+# tags that mark a citing paper (links and <h3> headings), skipping comments
+# and style/script bodies whole, without Python code running in between;
+# the rest of the markup is never tokenized. [PDF] markers are found with
+# str.find in the gap before each link.
+_TITLE_SCAN = re.compile(r'<(?:!--.*?-->|(?:style|script|STYLE|SCRIPT)\b[^>]*>.*?</(?:style|script|STYLE|SCRIPT)\s*>'
+                         r'|[aA]\b([^>]*)>(.*?)</[aA]\s*>|(/?)[hH]3\b)', re.DOTALL)
+_TAG = re.compile(r'<[^>]*>')
+_HREF = re.compile(r'\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\')', re.IGNORECASE)
+_OTHER_ENTITY = re.compile(r'&(?!amp;)')
+
+# Byline ("A Author, B Author - Venue, 2024") and snippet divs after a title
+_DIV = re.compile(r'<(?i:div)\b([^>]*)>(.*?)</(?i:div)\s*>', re.DOTALL)
+_BREAK = re.compile(r'<(?i:br)\b[^>]*>')
+
+def _href(raw_attributes):
+    """The href attribute, unescaped."""
+    match = _HREF.search(raw_attributes)
+    if not match:
+        return ''
+    href = match.group(1) or match.group(2) or ''
+    if '&' not in href:
+        return href
+    # Scholar links escape only their "&"s, and html.unescape costs a Python call per entity
+    return unescape(href) if _OTHER_ENTITY.search(href) else href.replace('&amp;', '&')
+
+def _text(html):
+    """Visible text of an HTML fragment, unescaped and with whitespace collapsed."""
+    if '<' in html:
+        html = _TAG.sub('', _BREAK.sub(' ', html))
+    return ' '.join(unescape(html).split())
+
+# Seed paper in localized alerts: <b>「Title」- 新的引用</b>, or 〈<a>Title</a>〉
+_SEED_IN_BRACKETS = re.compile(r'<(?i:b)\b[^>]*>[^<「]*「([^」<]+)」')
+_SEED_IN_ANGLES = re.compile(r'〈\s*<(?i:a)\b[^>]*>(.*?)</(?i:a)\s*>\s*〉', re.DOTALL)
+
+def clean_paper_title(title):
+    """Clean paper title by removing special characters and non-ASCII text."""
+    # Most titles are plain ASCII words, so each pass is skipped when it can't match
+    if '&' in title:
+        title = _HTML_ENTITY.sub('', title)
+    if not title.isascii():
+        title = _FOREIGN_SCRIPT.sub('', title)
+    title = ' '.join(title.split())  # also collapses non-breaking spaces
+
+    # Remove leading/trailing special characters
+    if not (title[:1].isalnum() and title[-1:].isalnum()):
+        title = _EDGE_PUNCTUATION.sub('', title)
+
+    # Only return if title has meaningful content (at least 5 characters)
+    return title if len(title) >= 5 else None
+
+# The url= parameter of a scholar.google.*/scholar_url redirect link, matched
+# directly (urlsplit + parse_qs would split and decode every parameter)
+_SCHOLAR_REDIRECT = re.compile(r'https?://scholar\.google\.[^/?#]+/scholar_url\?(?:[^#]*?&)?url=([^&#]*)')
+
+def unwrap_scholar_url(url):
+    """The target of a scholar.google.*/scholar_url?url=... redirect link; other URLs unchanged."""
+    match = _SCHOLAR_REDIRECT.match(url)
+    if match and match.group(1):
+        return unquote_plus(match.group(1))
+    return url
+
+@dataclass
+class AlertPaper:
+    """One citing paper listed in a Scholar alert.
+
+    The authors, venue and snippet are only parsed out of the alert HTML when
+    first read; most papers never need them.
+    """
+    title: str
+    url: str = ""  # where the title links to, with Scholar's redirect removed
+    has_pdf: bool = False
+    # The alert HTML and the span between this paper's title link and the next one
+    _html: str = field(default="", repr=False, compare=False)
+    _span: Tuple[int, int] = field(default=(0, 0), repr=False, compare=False)
+    _details: Optional[Tuple[str, str, str]] = field(default=None, repr=False, compare=False)
+
+    @property
+    def authors(self) -> str:
+        return self._parse_details()[0]
+
+    @property
+    def venue(self) -> str:
+        return self._parse_details()[1]
+
+    @property
+    def snippet(self) -> str:
+        return self._parse_details()[2]
+
+    def _parse_details(self) -> Tuple[str, str, str]:
+        """(authors, venue, snippet) from the byline and snippet divs after the title."""
+        if self._details is None:
+            authors = venue = snippet = ""
+            for match in _DIV.finditer(self._html, *self._span):
+                raw_attributes, inner = match.groups()
+                if 'gse_alrt_sni' in raw_attributes:
+                    snippet = _text(inner)
+                    break
+                if not (authors or venue):
+                    # "A Author, B Author - Venue, 2024"
+                    authors, _, venue = _text(inner).partition(' - ')
+                    authors, venue = authors.strip().rstrip('…').rstrip(), venue.strip()
+            self._details = (authors, venue, snippet)
+        return self._details
+
+def _title_links(body):
+    """Citing papers with their link's (start, end) in body, plus the first link's text.
+
+    A link is a paper title when it is inside an <h3> heading, follows a
+    [PDF] marker or has the gse_alrt_title class.
+    """
+    papers = []
+    first_link = None
+    h3_depth = 0
+    pdf_marker = False
+    previous_end = 0
+    for match in _TITLE_SCAN.finditer(body):
+        raw_attributes, inner, closing = match.groups()
+        start = match.start()
+        if not pdf_marker and body.find('[PDF]', previous_end, start) >= 0:
+            pdf_marker = True
+        previous_end = match.end()
+        if closing is not None:
+            h3_depth = max(0, h3_depth - 1) if closing else h3_depth + 1
+            continue
+        if raw_attributes is None:
+            continue
+        is_title = h3_depth or pdf_marker or 'gse_alrt_title' in raw_attributes
+        if not (is_title or first_link is None):
+            continue
+        text = _text(inner)
+        if not text:
+            continue
+        if first_link is None:
+            first_link = text
+        if is_title:
+            papers.append((AlertPaper(title=text, url=unwrap_scholar_url(_href(raw_attributes)),
+                                      has_pdf=pdf_marker), start, previous_end))
+            pdf_marker = False
+    return papers, first_link
+
+def _seed_paper(body, first_link):
+    """The cleaned title of the paper being cited: <b>「…」</b>, then 〈<a>…</a>〉, then the first link."""
+    for pattern in (_SEED_IN_BRACKETS, _SEED_IN_ANGLES):
+        match = pattern.search(body)
+        if match:
+            seed_paper = clean_paper_title(_text(match.group(1)))
+            if seed_paper:
+                return seed_paper
+    return clean_paper_title(first_link) if first_link else None
+
+def extract_alert_papers(email_body: str) -> Tuple[Optional[str], List[AlertPaper]]:
+    """Parse a Google Scholar alert.
+
+    Returns (seed_paper, papers): the cleaned title of the paper being cited,
+    and every citing paper with its link and [PDF] flag (authors, venue and
+    snippet are parsed when first read).
+    Papers whose title doesn't survive cleaning are dropped.
+    """
+    body = email_body or ''
+    links, first_link = _title_links(body)
+
+    papers = []
+    for index, (paper, _, end) in enumerate(links):
+        paper.title = clean_paper_title(paper.title)
+        if paper.title:
+            paper._html = body
+            paper._span = (end, links[index + 1][1] if index + 1 < len(links) else len(body))
+            papers.append(paper)
+
+    return _seed_paper(body, first_link), papers
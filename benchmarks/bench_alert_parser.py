@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: Scholar alert parsing over the saved alerts in fixtures/alerts.
+
+Compares the single-pass parser (alert_parser.extract_alert_papers) with the
+previous regex-based extract_paper_titles, and checks that every title the
+old parser found is still found.
+
+    python benchmarks/bench_alert_parser.py [--repeat 200] [--fixtures DIR]
+"""
+
+import argparse
+import glob
+import html
+import os
+import re
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from alert_parser import extract_alert_papers
+
+def legacy_clean_paper_title(title):
+    title = re.sub(r'&[a-z]+;', '', title)
+    title = re.sub(r'[\u4e00-\u9fff]+', '', title)
+    title = re.sub(r'[\u3040-\u309f]+', '', title)
+    title = re.sub(r'[\u30a0-\u30ff]+', '', title)
+    title = re.sub(r'[\u0600-\u06ff]+', '', title)
+    title = re.sub(r'[\xa0]+', ' ', title)
+    title = re.sub(r'[\s]+', ' ', title)
+    title = title.strip()
+    title = re.sub(r'^[\W_]+|[\W_]+$', '', title)
+    return title if len(title) >= 5 else None
+
+def legacy_extract_paper_titles(email_body):
+    """The regex parser this benchmark replaced, kept verbatim for comparison."""
+    email_body = html.unescape(email_body)
+    seed_paper = None
+    citing_papers = []
+
+    for match in re.finditer(r'\[PDF\].*?<a[^>]*>([^<]+)</a>', email_body, re.DOTALL):
+        cleaned_title = legacy_clean_paper_title(match.group(1).strip())
+        if cleaned_title:
+            citing_papers.append(cleaned_title)
+
+    match = re.search(r'<b>「([^」]+)」', email_body)
+    if match:
+        seed_paper = legacy_clean_paper_title(match.group(1).strip())
+    if not seed_paper:
+        match = re.search(r'〈<a[^>]*>([^<]+)</a>〉', email_body)
+        if match:
+            seed_paper = legacy_clean_paper_title(match.group(1).strip())
+    if not seed_paper:
+        match = re.search(r'<a[^>]*>([^<]+)</a>', email_body)
+        if match:
+            seed_paper = legacy_clean_paper_title(match.group(1).strip())
+
+    return seed_paper, citing_papers
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixtures", default=os.path.join(ROOT, "benchmarks", "fixtures", "alerts"))
+    parser.add_argument("--repeat", type=int, default=200, help="parses of the whole corpus per timing")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.fixtures, "*.html")))
+    if not paths:
+        sys.exit(f"No alert fixtures in {args.fixtures}")
+    corpus = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            corpus.append((os.path.basename(path), f.read()))
+    size = sum(len(body) for _, body in corpus)
+    print(f"{len(corpus)} alerts, {size / 1024:.0f} KiB")
+
+    # Correctness: same seed paper, and no title the old parser found is lost
+    for name, body in corpus:
+        old_seed, old_titles = legacy_extract_paper_titles(body)
+        new_seed, papers = extract_alert_papers(body)
+        new_titles = [paper.title for paper in papers]
+        missing = [title for title in old_titles if title not in new_titles]
+        status = "ok" if old_seed == new_seed and not missing else "MISMATCH"
+        pdf_count = sum(paper.has_pdf for paper in papers)
+        print(f"  {name}: {len(old_titles)} -> {len(new_titles)} papers ({pdf_count} [PDF]), "
+              f"seed {new_seed!r} [{status}]")
+        for title in missing:
+            print(f"    missing: {title}")
+
+    def with_details(body):
+        # Authors, venue and snippet are parsed on first access
+        seed_paper, papers = extract_alert_papers(body)
+        return seed_paper, [(paper.authors, paper.venue, paper.snippet) for paper in papers]
+
+    for label, function in (("legacy regex", legacy_extract_paper_titles),
+                            ("single pass", extract_alert_papers),
+                            ("+ details", with_details)):
+        best = min(timeit.repeat(lambda: [function(body) for _, body in corpus], number=args.repeat, repeat=3))
+        per_alert = best / (args.repeat * len(corpus)) * 1e6
+        print(f"{label:>13}: {per_alert:8.1f} us/alert, {size * args.repeat / best / 1e6:6.1f} MB/s")
+
+if __name__ == "__main__":
+    main()
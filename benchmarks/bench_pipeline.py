@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+"""
+End-to-end benchmark: one full processing run against local stubs, offline.
+
+Recorded Scholar alerts (fixtures/alerts) are served by an in-process fake
+Gmail service; arXiv queries and PDF downloads by stubs/arxiv_stub.py
+(fixtures/arxiv, fixtures/pdf); summaries and pages by the Anthropic and
+Notion stubs. Each service gets its own injected latency. The run starts
+from an empty data directory (cold caches) and its metrics summary - per
+stage p50/p95/totals and papers per minute - is saved to
+benchmarks/results/<commit>.json.
+
+    python benchmarks/bench_pipeline.py [--anthropic-latency 2] [--compare HEAD~1]
+
+--compare loads an earlier result (a file, or a commit whose result was
+saved) and exits with status 1 if throughput or any stage's total time got
+worse by more than --tolerance.
+"""
+
+import argparse
+import base64
+import contextlib
+import glob
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stubs import anthropic_stub, arxiv_stub, notion_stub
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SENDER = "Google Scholar Alerts <scholaralerts-noreply@google.com>"
+
+# Stage slowdowns smaller than this many seconds are treated as noise
+MIN_REGRESSION_SECONDS = 0.05
+
+class _FakeRequest:
+    def __init__(self, function, latency):
+        self.function = function
+        self.latency = latency
+
+    def execute(self):
+        time.sleep(self.latency)
+        return self.function()
+
+class _FakeBatch:
+    def __init__(self, callback, latency):
+        self.callback = callback
+        self.latency = latency
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request, callback or self.callback, request_id))
+
+    def execute(self):
+        # One HTTP round trip for the whole batch
+        time.sleep(self.latency)
+        for request, callback, request_id in self.requests:
+            callback(request_id, request.function(), None)
+
+class FakeGmail:
+    """The subset of the Gmail API service the pipeline uses, serving saved alerts."""
+
+    def __init__(self, bodies, latency=0.0):
+        self.latency = latency
+        self.messages_by_id = {}
+        for index, (subject, body) in enumerate(bodies):
+            message_id = f"bench{index:04d}"
+            self.messages_by_id[message_id] = {
+                "id": message_id,
+                "threadId": message_id,
+                "labelIds": ["INBOX", "UNREAD"],
+                "payload": {
+                    "mimeType": "text/html",
+                    "headers": [{"name": "Subject", "value": subject}, {"name": "From", "value": SENDER}],
+                    "body": {"data": base64.urlsafe_b64encode(body.encode("utf-8")).decode("ascii")},
+                },
+            }
+        self.unread = set(self.messages_by_id)
+        self.lock = threading.Lock()
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, userId, q="", maxResults=100, pageToken=None):
+        def page():
+            with self.lock:
+                ids = sorted(self.unread)
+            start = int(pageToken or 0)
+            result = {"messages": [{"id": i, "threadId": i} for i in ids[start:start + maxResults]],
+                      "resultSizeEstimate": len(ids)}
+            if start + maxResults < len(ids):
+                result["nextPageToken"] = str(start + maxResults)
+            return result
+        return _FakeRequest(page, self.latency)
+
+    def get(self, userId, id, format="full", **kwargs):
+        return _FakeRequest(lambda: self.messages_by_id[id], self.latency)
+
+    def batchModify(self, userId, body):
+        def modify():
+            if "UNREAD" in body.get("removeLabelIds", []):
+                with self.lock:
+                    self.unread.difference_update(body["ids"])
+            return {}
+        return _FakeRequest(modify, self.latency)
+
+    def modify(self, userId, id, body):
+        return self.batchModify(userId, {"ids": [id], **body})
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(callback, self.latency)
+
+def load_alerts(directory, pdf_base_url):
+    """(subject, body) for every saved alert, with non-arXiv PDF links sent to the stub."""
+    alerts = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            body = f.read()
+        body = body.replace("url=https://openreview.net/", f"url={pdf_base_url}/openreview/")
+        alerts.append((os.path.basename(path), body))
+    return alerts
+
+def git_revision():
+    """Short hash of HEAD, with "-dirty" if tracked files have uncommitted changes."""
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        changes = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                 capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return revision + ("-dirty" if changes else "")
+
+def run_benchmark(args):
+    """One pipeline run against fresh stubs and an empty data directory. Returns the run summary."""
+    anthropic_server, _ = anthropic_stub.start_server(latency=args.anthropic_latency, batch_delay=args.batch_delay)
+    # The pipeline's own rate limiter does the throttling: the stub's fixed
+    # one-second window would add 429s at random window boundaries
+    notion_server, notion_state = notion_stub.start_server(latency=args.notion_latency, rate=0)
+    arxiv_server, arxiv_state = arxiv_stub.start_server(latency=args.arxiv_latency, pdf_latency=args.pdf_latency)
+    arxiv_url = f"http://127.0.0.1:{arxiv_server.server_address[1]}"
+
+    data_dir = tempfile.mkdtemp(prefix="gs2notion-bench-")
+    os.environ.update({
+        "GS2NOTION_DATA_DIR": data_dir,
+        "ANTHROPIC_API_KEY": "bench",
+        "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{anthropic_server.server_address[1]}",
+        "NOTION_API_KEY": "bench",
+        "NOTION_BASE_URL": f"http://127.0.0.1:{notion_server.server_address[1]}",
+        "NOTION_RATE_LIMIT": str(args.notion_rate),
+        "ARXIV_API_URL": f"{arxiv_url}/api/query",
+        "GMAIL_SYNC_MODE": "query",
+        "SUMMARY_BATCH_MIN_PAPERS": str(args.batch_min),
+        "SUMMARY_BATCH_POLL_INTERVAL": "0.5",
+        "METRICS_PORT": "0",
+        "PIPELINE_ENGINE": args.engine,
+        "SUMMARY_REUSE_THRESHOLD": str(args.summary_reuse),
+    })
+    # Explicit paths in the environment or .env would point outside the temporary directory
+    for name in ("PAPER_CACHE_FILE", "PROCESSED_INDEX_FILE", "JOURNAL_FILE", "GMAIL_SYNC_STATE_FILE", "METRICS_FILE",
+                 "SUMMARY_INDEX_FILE"):
+        os.environ.pop(name, None)
+    # main.py logs to ./gs2notion.log
+    os.chdir(data_dir)
+
+    import main
+    import gmail_handler
+    import paper_fetcher
+    from config import METRICS_FILE
+
+    gmail = FakeGmail(load_alerts(args.alerts, arxiv_url), latency=args.gmail_latency)
+    gmail_handler.get_gmail_service = lambda: gmail
+    paper_fetcher._arxiv_client.delay_seconds = args.arxiv_delay
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+    output = sys.stdout if args.verbose else io.StringIO()
+    with contextlib.redirect_stdout(output):
+        main.process_scholar_emails()
+
+    run = None
+    with open(METRICS_FILE, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if "run" in record:
+                run = record["run"]
+
+    run["requests"] = {
+        "gmail_unread_left": len(gmail.unread),
+        "arxiv_queries": arxiv_state.query_count,
+        "pdf_downloads": arxiv_state.pdf_count,
+        "notion_requests": notion_state.request_count,
+        "notion_rate_limited": notion_state.rate_limited,
+    }
+    for server in (anthropic_server, notion_server, arxiv_server):
+        server.shutdown()
+    return run
+
+def load_result(reference):
+    """A saved result by path, or by the commit it was recorded at."""
+    if os.path.exists(reference):
+        path = reference
+    else:
+        try:
+            revision = subprocess.run(["git", "rev-parse", "--short", reference], cwd=ROOT,
+                                      capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            revision = reference
+        matches = sorted(glob.glob(os.path.join(RESULTS_DIR, f"{revision}*.json")))
+        if not matches:
+            sys.exit(f"No saved result for {reference} in {RESULTS_DIR}")
+        path = matches[0]
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def compare(old, new, tolerance):
+    """Print per-stage and throughput changes. Returns the regressions found."""
+    old_run, new_run = old["run"], new["run"]
+    print(f"Compared with {old['revision']} ({old['recorded']}):")
+    regressions = []
+
+    old_rate, new_rate = old_run["papers_per_minute"], new_run["papers_per_minute"]
+    change = (new_rate - old_rate) / old_rate if old_rate else 0.0
+    flag = ""
+    if change < -tolerance:
+        flag = "  REGRESSION"
+        regressions.append("throughput")
+    print(f"  {'papers/min':<24} {old_rate:>9.2f} -> {new_rate:>9.2f} ({change:+.0%}){flag}")
+
+    for stage in sorted(set(old_run["stages"]) | set(new_run["stages"])):
+        before, after = old_run["stages"].get(stage), new_run["stages"].get(stage)
+        if before is None or after is None:
+            print(f"  {stage:<24} {'only in ' + ('new' if before is None else 'old') + ' run':>30}")
+            continue
+        change = (after["total"] - before["total"]) / before["total"] if before["total"] else 0.0
+        flag = ""
+        if change > tolerance and after["total"] - before["total"] >= MIN_REGRESSION_SECONDS:
+            flag = "  REGRESSION"
+            regressions.append(stage)
+        print(f"  {stage:<24} total {before['total']:>7.2f}s -> {after['total']:>7.2f}s ({change:+.0%}), "
+              f"p50 {before['p50']:.3f}s -> {after['p50']:.3f}s, n {before['count']} -> {after['count']}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--alerts", default=os.path.join(ROOT, "benchmarks", "fixtures", "alerts"))
+    parser.add_argument("--gmail-latency", type=float, default=0.05, help="seconds per Gmail API call")
+    parser.add_argument("--arxiv-latency", type=float, default=0.2, help="seconds per arXiv API query")
+    parser.add_argument("--arxiv-delay", type=float, default=0.0,
+                        help="arxiv.Client delay between queries (the real client waits 3s)")
+    parser.add_argument("--pdf-latency", type=float, default=0.2, help="seconds per PDF download")
+    parser.add_argument("--anthropic-latency", type=float, default=1.0, help="seconds per Anthropic request")
+    parser.add_argument("--batch-delay", type=float, default=2.0, help="seconds until a message batch ends")
+    parser.add_argument("--engine", choices=("threads", "async"), default="threads", help="PIPELINE_ENGINE for the run")
+    parser.add_argument("--batch-min", type=int, default=0, help="SUMMARY_BATCH_MIN_PAPERS for the run (0 = no batches)")
+    # The fixture abstracts share one template, so reuse would match unrelated papers
+    parser.add_argument("--summary-reuse", type=float, default=0.0,
+                        help="SUMMARY_REUSE_THRESHOLD for the run (0 = always summarize)")
+    parser.add_argument("--notion-latency", type=float, default=0.1, help="seconds per Notion request")
+    parser.add_argument("--notion-rate", type=float, default=3.0, help="NOTION_RATE_LIMIT for the run (0 = unlimited)")
+    parser.add_argument("--compare", metavar="REF", help="saved result file or commit to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before flagging a regression")
+    parser.add_argument("--no-save", action="store_true", help="don't write benchmarks/results/<commit>.json")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own logs")
+    args = parser.parse_args()
+
+    # Resolve the reference before the run changes directory
+    baseline = load_result(args.compare) if args.compare else None
+
+    options = {key: value for key, value in vars(args).items()
+               if key not in ("compare", "tolerance", "no_save", "verbose")}
+    run = run_benchmark(args)
+
+    import metrics
+    print(metrics.format_summary(run))
+    print("  requests: " + ", ".join(f"{key} {value}" for key, value in run["requests"].items()))
+
+    result = {
+        "revision": git_revision(),
+        "recorded": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "options": options,
+        "run": run,
+    }
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{result['revision']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved {os.path.relpath(path, ROOT)}")
+
+    if baseline is not None:
+        if baseline.get("options") != options:
+            print("Warning: the saved result was recorded with different options")
+        regressions = compare(baseline, result, args.tolerance)
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
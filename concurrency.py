@@ -0,0 +1,41 @@
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from config import STAGE_LIMITS
+
+# One semaphore per external stage so a burst of papers can't exceed the
+# configured number of concurrent calls to any single service
+_stage_semaphores = {
+    stage: threading.BoundedSemaphore(max(1, limit))
+    for stage, limit in STAGE_LIMITS.items()
+}
+
+@contextmanager
+def stage_slot(stage: str):
+    """Hold one of the concurrency slots for `stage` for the duration of the block."""
+    semaphore = _stage_semaphores.get(stage)
+    if semaphore is None:
+        yield
+        return
+
+    with semaphore:
+        yield
+
+# The async engine's limits: asyncio semaphores belong to one event loop, so
+# each loop gets its own set
+_async_semaphores = weakref.WeakKeyDictionary()
+
+@asynccontextmanager
+async def stage_slot_async(stage: str):
+    """stage_slot for coroutines: the same per-stage limits, without blocking the event loop."""
+    limit = STAGE_LIMITS.get(stage)
+    if limit is None:
+        yield
+        return
+
+    semaphores = _async_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if stage not in semaphores:
+        semaphores[stage] = asyncio.Semaphore(max(1, limit))
+    async with semaphores[stage]:
+        yield
@@ -6,6 +6,12 @@ load_dotenv()
 # Gmail API
 GMAIL_CREDENTIALS_FILE = os.getenv("GMAIL_CREDENTIALS_FILE", "gmail_credentials.json")
 GMAIL_TOKEN_FILE = os.getenv("GMAIL_TOKEN_FILE", "gmail_token.json")
+# Messages per list page (Gmail allows up to 500), cap on alerts per run
+# (0 = no limit), and message fetches per batch HTTP request (Gmail
+# recommends at most 50)
+GMAIL_PAGE_SIZE = int(os.getenv("GMAIL_PAGE_SIZE", "100"))
+GMAIL_MAX_MESSAGES = int(os.getenv("GMAIL_MAX_MESSAGES", "0"))
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))
 
 # Notion API
 NOTION_API_KEY = os.getenv("NOTION_API_KEY")
@@ -14,11 +20,154 @@ NOTION_DATABASE_ID = "2f0ed936-f4f7-80fb-a285-f9c8a0e89a1f"  # GS Citation Inbox
 # Anthropic API
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
-# Gmail polling interval (in seconds)
-POLL_INTERVAL = 1 * 60  # 1 minute for testing
+# Gmail polling interval (in seconds); in push mode polling is only a fallback
+POLL_INTERVAL = int(os.getenv("POLL_INTERVAL", str(6 * 3600)))
 
 # Google Scholar sender email
 GOOGLE_SCHOLAR_SENDER = "scholaralerts-noreply@google.com"
 
+# Only process alert entries marked [PDF], as before alert links were parsed;
+# "false" also processes [HTML] and link-only entries (about twice the papers
+# per alert, each one more arXiv lookup, Claude call and Notion page)
+ALERT_PDF_ONLY = os.getenv("ALERT_PDF_ONLY", "true").lower() in ("1", "true", "yes")
+
 # Summarization prompt
 SUMMARY_PROMPT = """Please read this paper and provide a structured summary that details the **core motivation** (what problem it solves and why existing methods fail), the **key methodology** (briefly explaining the technical approach, architecture, or loss function), and the **main contributions**. Summarize the **quantitative results**, specifically comparing them to previous baseline methods and highlighting the margin of improvement on key datasets. If available, explicitly analyze the **computational cost** (training vs. inference time, memory usage) and summarize the key takeaways from the **ablation studies** to identify which components contributed most to the performance gain. Finally, list any stated **limitations or assumptions** made by the authors. Also, noting the incorporation of guidance(CFG, how, what scale value.)"""
+
+# Pipeline concurrency: number of papers processed in parallel, plus a
+# separate cap on in-flight calls for each external stage
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+STAGE_LIMITS = {
+    "arxiv": int(os.getenv("ARXIV_CONCURRENCY", "1")),
+    "pdf": int(os.getenv("PDF_CONCURRENCY", "4")),
+    "anthropic": int(os.getenv("ANTHROPIC_CONCURRENCY", "2")),
+    "notion": int(os.getenv("NOTION_CONCURRENCY", "2")),
+}
+# "threads" runs each paper on the PIPELINE_WORKERS pool; "async" runs up to
+# ASYNC_MAX_JOBS papers on one event loop with long-lived HTTP/2 connection
+# pools (ASYNC_MAX_CONNECTIONS per service). STAGE_LIMITS apply to both.
+PIPELINE_ENGINE = os.getenv("PIPELINE_ENGINE", "threads")
+ASYNC_MAX_JOBS = int(os.getenv("ASYNC_MAX_JOBS", "100"))
+ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "10"))
+
+# Local state (caches, indexes) lives here
+DATA_DIR = os.getenv("GS2NOTION_DATA_DIR", ".gs2notion")
+
+# On-disk cache of arXiv metadata and extracted PDF text
+PAPER_CACHE_FILE = os.getenv("PAPER_CACHE_FILE", os.path.join(DATA_DIR, "paper_cache.sqlite3"))
+PAPER_CACHE_TTL = int(os.getenv("PAPER_CACHE_TTL", str(30 * 24 * 3600)))  # 30 days
+PAPER_CACHE_MAX_BYTES = int(os.getenv("PAPER_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))  # 200 MB
+
+# Batched arXiv title resolution: titles per OR-combined query, and the
+# minimum title similarity (0..1) for a result to count as a match
+ARXIV_BATCH_SIZE = int(os.getenv("ARXIV_BATCH_SIZE", "10"))
+ARXIV_MATCH_THRESHOLD = float(os.getenv("ARXIV_MATCH_THRESHOLD", "0.9"))
+# arXiv API endpoint (override to point at a local stub, e.g. stubs/arxiv_stub.py)
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "https://export.arxiv.org/api/query")
+
+# PDF download/extraction limits: PDFs are streamed to a temp file and
+# abandoned past PDF_MAX_BYTES; pages are parsed one at a time until
+# PDF_MAX_PAGES or PDF_MAX_CHARS is reached or PDF_TIMEOUT seconds elapse
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(25 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "40"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "300000"))
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "120"))
+
+# Parse PDFs in a pool of worker processes (0 = parse in the calling thread).
+# A worker still busy PDF_PARSE_GRACE seconds past the document's time
+# budget is killed.
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", "0"))
+PDF_PARSE_GRACE = float(os.getenv("PDF_PARSE_GRACE", "10"))
+
+# Ask for the summary and the one-sentence TLDR in a single Claude call
+# (False = separate summary and TLDR calls)
+COMBINED_SUMMARY = os.getenv("COMBINED_SUMMARY", "true").lower() in ("1", "true", "yes")
+
+# Summarize through the Message Batches API when a run has at least this many
+# papers (0 = never, the default). Results are polled every
+# SUMMARY_BATCH_POLL_INTERVAL seconds for at most SUMMARY_BATCH_TIMEOUT
+# seconds, and nothing reaches Notion before then, so this suits backlog runs
+SUMMARY_BATCH_MIN_PAPERS = int(os.getenv("SUMMARY_BATCH_MIN_PAPERS", "0"))
+SUMMARY_BATCH_POLL_INTERVAL = float(os.getenv("SUMMARY_BATCH_POLL_INTERVAL", "30"))
+SUMMARY_BATCH_TIMEOUT = float(os.getenv("SUMMARY_BATCH_TIMEOUT", str(6 * 3600)))
+
+# Token budgets: paper text sent to Claude is trimmed of references /
+# acknowledgements / appendix and fitted to SUMMARY_INPUT_TOKENS; the summary
+# stored in Notion is cut to SUMMARY_OUTPUT_TOKENS
+SUMMARY_INPUT_TOKENS = int(os.getenv("SUMMARY_INPUT_TOKENS", "30000"))
+SUMMARY_OUTPUT_TOKENS = int(os.getenv("SUMMARY_OUTPUT_TOKENS", "1200"))
+
+# Citing titles at least this similar (0..1) after normalization are treated
+# as the same paper and fetched/summarized once per polling cycle
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.93"))
+
+# Local index of summarized papers: a paper whose title + abstract is at
+# least SUMMARY_REUSE_THRESHOLD similar (cosine, 0..1) to one summarized
+# before (e.g. its v2, or the conference version of a workshop paper) reuses
+# that summary and TLDR instead of calling Claude (0 = never reuse). Papers
+# without an abstract only reuse a summary with the same title or arXiv id
+SUMMARY_INDEX_FILE = os.getenv("SUMMARY_INDEX_FILE", os.path.join(DATA_DIR, "summaries.sqlite3"))
+SUMMARY_INDEX_DIM = int(os.getenv("SUMMARY_INDEX_DIM", "2048"))
+SUMMARY_REUSE_THRESHOLD = float(os.getenv("SUMMARY_REUSE_THRESHOLD", "0.85"))
+
+# Local index of papers already written to Notion, checked before any
+# fetching or summarizing (rebuilt from the Notion database until a rebuild
+# has completed)
+PROCESSED_INDEX_FILE = os.getenv("PROCESSED_INDEX_FILE", os.path.join(DATA_DIR, "processed.sqlite3"))
+
+# Journal of per-paper pipeline progress, so restarts resume where they
+# stopped; failed papers are retried on later runs up to JOURNAL_MAX_ATTEMPTS.
+# Written jobs, and failed jobs out of attempts, are dropped after
+# JOURNAL_RETENTION seconds
+JOURNAL_FILE = os.getenv("JOURNAL_FILE", os.path.join(DATA_DIR, "journal.sqlite3"))
+JOURNAL_MAX_ATTEMPTS = int(os.getenv("JOURNAL_MAX_ATTEMPTS", "3"))
+JOURNAL_RETENTION = int(os.getenv("JOURNAL_RETENTION", str(7 * 24 * 3600)))  # 7 days
+
+# Notion API: base URL (point at stubs/notion_stub.py for local testing),
+# sustained request rate (Notion allows ~3 req/s per integration) and how
+# often a rate-limited or failed request is retried
+NOTION_BASE_URL = os.getenv("NOTION_BASE_URL", "https://api.notion.com")
+NOTION_RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))
+NOTION_MAX_RETRIES = int(os.getenv("NOTION_MAX_RETRIES", "5"))
+
+# Gmail sync: "query" lists unread alerts every cycle; "history" only asks
+# Gmail for messages added since the last run (saved in GMAIL_SYNC_STATE_FILE)
+# and falls back to the unread query when that point is too old
+GMAIL_SYNC_MODE = os.getenv("GMAIL_SYNC_MODE", "history")
+GMAIL_SYNC_STATE_FILE = os.getenv("GMAIL_SYNC_STATE_FILE", os.path.join(DATA_DIR, "gmail_sync.json"))
+
+# Push mode: with GMAIL_PUSH_TOPIC set (projects/<project>/topics/<topic>),
+# main.py asks Gmail to publish mailbox changes to that Pub/Sub topic and
+# processes new mail as soon as the push subscription delivers it to
+# push_listener.py. PUSH_TOKEN is required and must match the ?token= in the
+# subscription's endpoint URL. The Gmail watch expires after 7 days and is
+# renewed every GMAIL_WATCH_RENEW seconds.
+GMAIL_PUSH_TOPIC = os.getenv("GMAIL_PUSH_TOPIC", "")
+PUSH_HOST = os.getenv("PUSH_HOST", "0.0.0.0")
+PUSH_PORT = int(os.getenv("PUSH_PORT", "8085"))
+PUSH_TOKEN = os.getenv("PUSH_TOKEN", "")
+GMAIL_WATCH_RENEW = int(os.getenv("GMAIL_WATCH_RENEW", str(24 * 3600)))
+
+# Metrics: per-stage spans and run summaries as JSON lines ("" = off), moved
+# to METRICS_FILE.1 once the file reaches METRICS_MAX_BYTES (0 = never), and
+# an optional Prometheus /metrics endpoint (0 = off)
+METRICS_FILE = os.getenv("METRICS_FILE", os.path.join(DATA_DIR, "metrics.jsonl"))
+METRICS_MAX_BYTES = int(os.getenv("METRICS_MAX_BYTES", str(20 * 1024 * 1024)))  # 20 MB
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Retries for every external call (Gmail, arXiv, PDF hosts, Anthropic,
+# Notion): attempts per call, with exponential backoff and full jitter
+# starting at RETRY_BASE_DELAY seconds. A Retry-After longer than
+# RETRY_MAX_DELAY fails the call instead of stalling it. Retries per
+# endpoint are capped at RETRY_BUDGET_RATIO of its calls (plus a burst of
+# RETRY_BUDGET_BURST), so an outage doesn't multiply the load.
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_BURST = float(os.getenv("RETRY_BUDGET_BURST", "10"))
+# After CIRCUIT_FAILURE_THRESHOLD consecutive failures an endpoint's calls
+# fail fast for CIRCUIT_RESET_TIMEOUT seconds, then one trial call decides
+# whether it is back
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "60"))
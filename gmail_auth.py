@@ -1,8 +1,13 @@
 import json
 import os
+import threading
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
 from config import GMAIL_CREDENTIALS_FILE, GMAIL_TOKEN_FILE
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
@@ -16,14 +21,25 @@ def setup_gmail_credentials():
     creds = flow.run_local_server(port=8080, open_browser=True, prompt='consent')
 
     # Save token for future use (as JSON)
+    _save_credentials(creds)
+    print(f"[OK] Credentials saved to {GMAIL_TOKEN_FILE}")
+    return creds
+
+# One Gmail service per process. googleapiclient's httplib2 transport isn't
+# thread-safe, so every thread gets its own authorized connection (kept
+# alive between requests) while sharing the credentials and discovery.
+_service = None
+_creds = None
+_lock = threading.Lock()
+_local = threading.local()
+
+def _save_credentials(creds):
     token_data = json.loads(creds.to_json())
     with open(GMAIL_TOKEN_FILE, 'w') as token_file:
         json.dump(token_data, token_file, indent=2)
-    print(f"[OK] Credentials saved to {GMAIL_TOKEN_FILE}")
-    return creds
 
-def get_gmail_service():
-    """Authenticate and return Gmail service (no browser interaction needed after setup)."""
+def _load_credentials():
+    """Load the saved token, refreshing it if expired."""
     creds = None
 
     # Load existing token
@@ -43,9 +59,7 @@ def get_gmail_service():
         try:
             creds.refresh(Request())
             # Save refreshed token
-            token_data = json.loads(creds.to_json())
-            with open(GMAIL_TOKEN_FILE, 'w') as token_file:
-                json.dump(token_data, token_file, indent=2)
+            _save_credentials(creds)
             print("[OK] Token refreshed and saved")
         except Exception as e:
             print(f"Failed to refresh token: {e}")
@@ -56,5 +70,49 @@ def get_gmail_service():
         print("python setup_gmail.py")
         raise ValueError("Gmail credentials not found. Run setup_gmail.py first.")
 
-    from googleapiclient.discovery import build
-    return build('gmail', 'v1', credentials=creds)
+    return creds
+
+def _ensure_fresh_credentials():
+    """Refresh the shared token once, under a lock, if it's about to expire."""
+    if _creds.valid:
+        return
+    with _lock:
+        if not _creds.valid:
+            print("Token expired, refreshing...")
+            _creds.refresh(Request())
+            _save_credentials(_creds)
+            print("[OK] Token refreshed and saved")
+
+def _thread_http():
+    """This thread's authorized HTTP connection."""
+    http = getattr(_local, 'http', None)
+    if http is None:
+        http = _local.http = AuthorizedHttp(_creds, http=httplib2.Http(timeout=60))
+    return http
+
+def _build_request(http, *args, **kwargs):
+    # Ignore the service's shared http and use this thread's connection
+    _ensure_fresh_credentials()
+    return HttpRequest(_thread_http(), *args, **kwargs)
+
+def get_gmail_service():
+    """Authenticate and return Gmail service (no browser interaction needed after setup).
+
+    The service is built once per process from the discovery document bundled
+    with googleapiclient, and is safe to share between threads.
+    """
+    global _service, _creds
+    if _service is not None:
+        return _service
+
+    with _lock:
+        if _service is None:
+            _creds = _load_credentials()
+            _service = build(
+                'gmail', 'v1',
+                http=_thread_http(),
+                requestBuilder=_build_request,
+                static_discovery=True,
+                cache_discovery=False
+            )
+    return _service
@@ -1,156 +1,314 @@
 import base64
-import re
-import time
+import json
+import os
+from googleapiclient.errors import HttpError
 from gmail_auth import get_gmail_service
-from config import GOOGLE_SCHOLAR_SENDER
+from alert_parser import extract_alert_papers, clean_paper_title
+import metrics
+import resilience
+from config import (GOOGLE_SCHOLAR_SENDER, GMAIL_PAGE_SIZE, GMAIL_MAX_MESSAGES, GMAIL_BATCH_SIZE,
+                    GMAIL_SYNC_MODE, GMAIL_SYNC_STATE_FILE)
 
-def get_unread_scholar_emails(retries=10):
-    """Fetch unread emails from Google Scholar with retry logic."""
+# Gmail reports per-user rate limiting as 403 with one of these reasons
+_RATE_LIMIT_REASONS = (b'rateLimitExceeded', b'userRateLimitExceeded')
+
+def _is_retryable(error):
+    if isinstance(error, HttpError) and error.resp.status == 403:
+        return any(reason in (error.content or b'') for reason in _RATE_LIMIT_REASONS)
+    return resilience.is_transient(error)
+
+def _execute(request, stage):
+    """Execute a Gmail API request (or batch) as one metrics span, retrying transient errors."""
+    with metrics.span(stage, paper="") as span:
+        return resilience.call("gmail", request.execute, retryable=_is_retryable, span=span)
+
+def get_unread_scholar_emails():
+    """Fetch unread emails from Google Scholar.
+
+    Follows nextPageToken until every unread alert is listed (up to
+    GMAIL_MAX_MESSAGES, 0 = no limit). Transient errors are retried with
+    backoff; if a page still fails, the pages fetched so far are returned.
+    """
     service = get_gmail_service()
+    messages = []
+    page_token = None
 
-    for attempt in range(retries):
+    while True:
         try:
             # Query for unread emails from Google Scholar
-            print(f"Querying Gmail for unread emails from {GOOGLE_SCHOLAR_SENDER}... (attempt {attempt + 1}/{retries})")
-            results = service.users().messages().list(
+            print(f"Querying Gmail for unread emails from {GOOGLE_SCHOLAR_SENDER}...")
+            results = _execute(service.users().messages().list(
                 userId='me',
                 q=f'from:{GOOGLE_SCHOLAR_SENDER} is:unread',
-                maxResults=10
-            ).execute()
-
-            messages = results.get('messages', [])
-            print(f"Found {len(messages)} unread emails")
-            return messages
+                maxResults=GMAIL_PAGE_SIZE,
+                pageToken=page_token
+            ), 'gmail.list')
         except Exception as e:
-            print(f"Error fetching emails (attempt {attempt + 1}): {e}")
-            if attempt < retries - 1:
-                wait_time = 10  # Fixed 10 second wait
-                print(f"Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                print("Max retries reached")
-                return []
+            # Keep whatever earlier pages returned
+            print(f"Error fetching emails: {e}")
+            return messages
+
+        messages.extend(results.get('messages', []))
+        page_token = results.get('nextPageToken')
+        if not page_token or 0 < GMAIL_MAX_MESSAGES <= len(messages):
+            break
+
+    if GMAIL_MAX_MESSAGES > 0:
+        messages = messages[:GMAIL_MAX_MESSAGES]
+    print(f"Found {len(messages)} unread emails")
+    return messages
+
+def _load_sync_state():
+    try:
+        with open(GMAIL_SYNC_STATE_FILE, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Error reading Gmail sync state: {e}")
+        return {}
+
+def _save_sync_state(state):
+    directory = os.path.dirname(GMAIL_SYNC_STATE_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Write to a temp file first so a crash never leaves a half-written state
+    temp_file = GMAIL_SYNC_STATE_FILE + '.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_file, GMAIL_SYNC_STATE_FILE)
+
+def _list_history(service, start_history_id):
+    """Ids of messages added since start_history_id, and the latest history id."""
+    message_ids = []
+    history_id = start_history_id
+    page_token = None
+
+    while True:
+        results = _execute(service.users().history().list(
+            userId='me',
+            startHistoryId=start_history_id,
+            historyTypes=['messageAdded'],
+            maxResults=GMAIL_PAGE_SIZE,
+            pageToken=page_token
+        ), 'gmail.history')
+
+        for record in results.get('history', []):
+            for added in record.get('messagesAdded', []):
+                labels = added['message'].get('labelIds', [])
+                if 'SENT' not in labels and 'DRAFT' not in labels:
+                    message_ids.append(added['message']['id'])
+        history_id = results.get('historyId', history_id)
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return message_ids, history_id
+
+def _scholar_messages(service, message_ids):
+    """Keep only the messages sent by Google Scholar, checked via batched header fetches."""
+    senders = {}
+
+    def callback(request_id, response, exception):
+        if exception is None:
+            headers = response.get('payload', {}).get('headers', [])
+            senders[request_id] = next((h['value'] for h in headers if h['name'] == 'From'), '')
+
+    for start in range(0, len(message_ids), GMAIL_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=callback)
+        for message_id in message_ids[start:start + GMAIL_BATCH_SIZE]:
+            batch.add(
+                service.users().messages().get(userId='me', id=message_id, format='metadata',
+                                               metadataHeaders=['From']),
+                request_id=message_id
+            )
+        _execute(batch, 'gmail.headers_batch')
+
+    # Messages deleted since they arrived have no sender and are dropped
+    return [{'id': message_id} for message_id in message_ids
+            if GOOGLE_SCHOLAR_SENDER in senders.get(message_id, '')]
+
+def get_new_scholar_emails():
+    """Fetch Google Scholar emails that haven't been processed yet.
+
+    Returns (messages, sync_token). In "history" sync mode only messages
+    added since the last committed sync are listed, plus any left unfinished
+    last time; pass sync_token to commit_sync() once the messages are
+    processed. In "query" mode this is get_unread_scholar_emails() and the
+    token is None.
+    """
+    if GMAIL_SYNC_MODE != 'history':
+        return get_unread_scholar_emails(), None
+
+    service = get_gmail_service()
+    state = _load_sync_state()
+    pending = state.get('pending', [])
+
+    if state.get('history_id'):
+        try:
+            print(f"Listing Gmail changes since history id {state['history_id']}...")
+            added, history_id = _list_history(service, state['history_id'])
+            new_ids = [message_id for message_id in dict.fromkeys(added) if message_id not in pending]
+            messages = [{'id': message_id} for message_id in pending] + _scholar_messages(service, new_ids)
+            print(f"Found {len(messages)} new emails")
+            return messages, history_id
+        except HttpError as e:
+            # Gmail only keeps about a week of history; older ids return 404
+            if e.resp.status != 404:
+                raise
+            print("Gmail history id expired, falling back to a full unread query")
+
+    # Read the current history id first so nothing arriving during the query is missed
+    history_id = _execute(service.users().getProfile(userId='me'), 'gmail.profile')['historyId']
+    messages = get_unread_scholar_emails()
+    known = {message['id'] for message in messages}
+    messages += [{'id': message_id} for message_id in pending if message_id not in known]
+    return messages, history_id
+
+def watch_mailbox(topic):
+    """Ask Gmail to publish inbox changes to a Pub/Sub topic. Returns the watch response.
+
+    The response carries the current historyId and the watch's expiration
+    (epoch milliseconds); the watch has to be renewed before it expires.
+    """
+    service = get_gmail_service()
+    response = _execute(service.users().watch(
+        userId='me',
+        body={'topicName': topic, 'labelIds': ['INBOX'], 'labelFilterBehavior': 'include'}
+    ), 'gmail.watch')
+    print(f"Watching Gmail inbox via {topic} (history id {response.get('historyId')})")
+    return response
+
+def commit_sync(sync_token, unfinished_ids=()):
+    """Record that everything up to sync_token was processed.
+
+    Messages in unfinished_ids are listed again on the next sync.
+    """
+    if sync_token is None:
+        return
+    try:
+        _save_sync_state({'history_id': sync_token, 'pending': list(unfinished_ids)})
+    except OSError as e:
+        print(f"Error saving Gmail sync state: {e}")
+
+def _parse_message(message):
+    """Subject, sender and plain-text body of a full-format Gmail message."""
+    headers = message['payload']['headers']
+    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
+    sender = next((h['value'] for h in headers if h['name'] == 'From'), '')
+
+    # Extract body
+    body = ''
+    if 'parts' in message['payload']:
+        for part in message['payload']['parts']:
+            if part['mimeType'] == 'text/plain':
+                data = part['body'].get('data', '')
+                if data:
+                    body = base64.urlsafe_b64decode(data).decode('utf-8')
+                break
+    else:
+        data = message['payload']['body'].get('data', '')
+        if data:
+            body = base64.urlsafe_b64decode(data).decode('utf-8')
+
+    return {
+        'id': message['id'],
+        'subject': subject,
+        'sender': sender,
+        'body': body
+    }
 
 def get_email_details(message_id):
     """Get full email details including body."""
     service = get_gmail_service()
 
     try:
-        message = service.users().messages().get(
+        message = _execute(service.users().messages().get(
             userId='me',
             id=message_id,
             format='full'
-        ).execute()
-
-        headers = message['payload']['headers']
-        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
-        sender = next((h['value'] for h in headers if h['name'] == 'From'), '')
-
-        # Extract body
-        body = ''
-        if 'parts' in message['payload']:
-            for part in message['payload']['parts']:
-                if part['mimeType'] == 'text/plain':
-                    data = part['body'].get('data', '')
-                    if data:
-                        body = base64.urlsafe_b64decode(data).decode('utf-8')
-                    break
-        else:
-            data = message['payload']['body'].get('data', '')
-            if data:
-                body = base64.urlsafe_b64decode(data).decode('utf-8')
-
-        return {
-            'id': message_id,
-            'subject': subject,
-            'sender': sender,
-            'body': body
-        }
+        ), 'gmail.get')
+        return _parse_message(message)
     except Exception as e:
         print(f"Error getting email details: {e}")
         return None
 
+def get_emails_details(message_ids):
+    """Get details for many emails in a few batch HTTP requests.
+
+    Returns {message_id: details or None}. Messages that fail inside a batch
+    (e.g. per-message rate limiting) are retried one at a time.
+    """
+    if not message_ids:
+        return {}
+    service = get_gmail_service()
+    details = {}
+    failed = []
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            failed.append(request_id)
+        else:
+            details[request_id] = _parse_message(response)
+
+    for start in range(0, len(message_ids), GMAIL_BATCH_SIZE):
+        chunk = message_ids[start:start + GMAIL_BATCH_SIZE]
+        batch = service.new_batch_http_request(callback=callback)
+        for message_id in chunk:
+            batch.add(
+                service.users().messages().get(userId='me', id=message_id, format='full'),
+                request_id=message_id
+            )
+        try:
+            _execute(batch, 'gmail.fetch_batch')
+        except Exception as e:
+            print(f"Error fetching email batch: {e}")
+            failed.extend(message_id for message_id in chunk if message_id not in details)
+
+    for message_id in failed:
+        details[message_id] = get_email_details(message_id)
+    return details
+
 def extract_paper_titles(email_body):
     """Extract both seed paper and citing papers from Google Scholar email.
 
     Returns: (seed_paper, citing_papers) tuple
     - seed_paper: The original paper being cited
     - citing_papers: List of new papers that cite the seed paper
+
+    See alert_parser.extract_alert_papers for links, authors and venues.
     """
-    import html
-    import re
-
-    # Decode HTML entities
-    email_body = html.unescape(email_body)
-
-    seed_paper = None
-    citing_papers = []
-
-    # Extract all citing papers (the ones with [PDF] link)
-    # Pattern: [PDF]</span> <a ...>Title</a>
-    matches = re.finditer(r'\[PDF\].*?<a[^>]*>([^<]+)</a>', email_body, re.DOTALL)
-    for match in matches:
-        title = match.group(1).strip()
-        cleaned_title = clean_paper_title(title)
-        if cleaned_title:
-            citing_papers.append(cleaned_title)
-
-    # Extract seed paper - try multiple patterns
-    # Pattern 1: <b>「Title」- 新的引用</b>
-    match = re.search(r'<b>「([^」]+)」', email_body)
-    if match:
-        title = match.group(1).strip()
-        seed_paper = clean_paper_title(title)
-
-    # Pattern 2: 〈<a ...>Title</a>〉 (Chinese angle brackets)
-    if not seed_paper:
-        match = re.search(r'〈<a[^>]*>([^<]+)</a>〉', email_body)
-        if match:
-            title = match.group(1).strip()
-            seed_paper = clean_paper_title(title)
-
-    # Pattern 3: Look for text in first <a> tag (fallback)
-    if not seed_paper:
-        match = re.search(r'<a[^>]*>([^<]+)</a>', email_body)
-        if match:
-            title = match.group(1).strip()
-            seed_paper = clean_paper_title(title)
-
-    return seed_paper, citing_papers
+    seed_paper, papers = extract_alert_papers(email_body)
+    return seed_paper, [paper.title for paper in papers]
 
 def extract_paper_title(email_body):
     """Extract paper title from Google Scholar email (legacy function)."""
     seed_paper, citing_paper = extract_paper_titles(email_body)
     return citing_paper or seed_paper
 
-def clean_paper_title(title):
-    """Clean paper title by removing special characters and non-ASCII text."""
-    # Remove HTML entities and special characters
-    title = re.sub(r'&[a-z]+;', '', title)  # Remove HTML entities like &nbsp;
-    title = re.sub(r'[\u4e00-\u9fff]+', '', title)  # Remove Chinese characters
-    title = re.sub(r'[\u3040-\u309f]+', '', title)  # Remove Japanese hiragana
-    title = re.sub(r'[\u30a0-\u30ff]+', '', title)  # Remove Japanese katakana
-    title = re.sub(r'[\u0600-\u06ff]+', '', title)  # Remove Arabic characters
-    title = re.sub(r'[\xa0]+', ' ', title)  # Replace non-breaking spaces with regular spaces
-    title = re.sub(r'[\s]+', ' ', title)  # Collapse multiple spaces
-    title = title.strip()
-
-    # Remove leading/trailing special characters
-    title = re.sub(r'^[\W_]+|[\W_]+$', '', title)
-
-    # Only return if title has meaningful content (at least 5 characters)
-    return title if len(title) >= 5 else None
-
 def mark_email_as_read(message_id):
     """Mark email as read."""
     service = get_gmail_service()
 
     try:
-        service.users().messages().modify(
+        _execute(service.users().messages().modify(
             userId='me',
             id=message_id,
             body={'removeLabelIds': ['UNREAD']}
-        ).execute()
+        ), 'gmail.modify')
     except Exception as e:
         print(f"Error marking email as read: {e}")
 
+
+def mark_emails_as_read(message_ids):
+    """Mark many emails as read with one batchModify call per 1000 messages."""
+    if not message_ids:
+        return
+    service = get_gmail_service()
+
+    for start in range(0, len(message_ids), 1000):
+        try:
+            _execute(service.users().messages().batchModify(
+                userId='me',
+                body={'ids': list(message_ids[start:start + 1000]), 'removeLabelIds': ['UNREAD']}
+            ), 'gmail.batch_modify')
+        except Exception as e:
+            print(f"Error marking emails as read: {e}")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+Crash-safe journal of per-paper pipeline progress.
+
+Every citing paper moves through queued -> fetched -> summarized -> written,
+and its intermediate artifacts (paper text, summary, TLDR) are saved at each
+step. A restarted run picks unfinished papers up at the stage where they
+stopped instead of starting over; failed papers are retried on later runs
+up to JOURNAL_MAX_ATTEMPTS times.
+
+Inspect and retry from the command line:
+    python job_journal.py list [--state failed]
+    python job_journal.py show <job key or title>
+    python job_journal.py retry <job key or title> | --all
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import List, Optional
+from config import JOURNAL_FILE, JOURNAL_MAX_ATTEMPTS, JOURNAL_RETENTION
+from titles import normalize_title
+
+QUEUED = "queued"
+FETCHED = "fetched"
+SUMMARIZED = "summarized"
+WRITTEN = "written"
+STATES = (QUEUED, FETCHED, SUMMARIZED, WRITTEN)
+
+_lock = threading.Lock()
+_conn = None
+
+def _connect():
+    global _conn
+    if _conn is None:
+        directory = os.path.dirname(JOURNAL_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _conn = sqlite3.connect(JOURNAL_FILE, check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_key TEXT PRIMARY KEY,
+                citing_title TEXT NOT NULL,
+                citations TEXT NOT NULL,
+                state TEXT NOT NULL,
+                paper TEXT,
+                content TEXT NOT NULL DEFAULT '',
+                summary TEXT NOT NULL DEFAULT '',
+                tldr TEXT NOT NULL DEFAULT '',
+                error TEXT NOT NULL DEFAULT '',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        _conn.commit()
+    return _conn
+
+def job_key(citing_title: str) -> str:
+    return normalize_title(citing_title)
+
+def _to_dict(row) -> dict:
+    record = dict(row)
+    record["citations"] = [tuple(c) for c in json.loads(record["citations"])]
+    record["paper"] = json.loads(record["paper"]) if record["paper"] else None
+    return record
+
+def load(key: str) -> Optional[dict]:
+    """Return the journal record for a job key, or None."""
+    with _lock:
+        row = _connect().execute("SELECT * FROM jobs WHERE job_key = ?", (key,)).fetchone()
+    return _to_dict(row) if row else None
+
+def save(key: str, citing_title: str, citations: list, state: str, paper: Optional[dict] = None,
+         content: str = "", summary: str = "", tldr: str = "", error: str = ""):
+    """Persist a job's state and artifacts. A non-empty error counts as a failed attempt."""
+    with _lock:
+        conn = _connect()
+        row = conn.execute("SELECT attempts FROM jobs WHERE job_key = ?", (key,)).fetchone()
+        attempts = (row["attempts"] if row else 0) + (1 if error else 0)
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_key, citing_title, citations, state, paper, content, summary, "
+            "tldr, error, attempts, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, citing_title, json.dumps(list(citations)), state,
+             json.dumps(paper) if paper else None, content or "", summary or "", tldr or "",
+             error, attempts, time.time())
+        )
+        conn.commit()
+
+def pending() -> List[dict]:
+    """Unfinished jobs that haven't used up their retry attempts, oldest first."""
+    with _lock:
+        rows = _connect().execute(
+            "SELECT * FROM jobs WHERE state != ? AND attempts < ? ORDER BY updated_at",
+            (WRITTEN, JOURNAL_MAX_ATTEMPTS)
+        ).fetchall()
+    return [_to_dict(row) for row in rows]
+
+def prune():
+    """Forget written jobs, and failed jobs out of attempts, older than JOURNAL_RETENTION seconds."""
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            "DELETE FROM jobs WHERE (state = ? OR attempts >= ?) AND updated_at < ?",
+            (WRITTEN, JOURNAL_MAX_ATTEMPTS, time.time() - JOURNAL_RETENTION)
+        )
+        conn.commit()
+
+def list_jobs(state: Optional[str] = None) -> List[dict]:
+    """All jobs, or only those in `state` ("failed" = jobs with an error)."""
+    query = "SELECT * FROM jobs"
+    params = ()
+    if state == "failed":
+        query += " WHERE error != ''"
+    elif state:
+        query += " WHERE state = ?"
+        params = (state,)
+    with _lock:
+        rows = _connect().execute(query + " ORDER BY updated_at", params).fetchall()
+    return [_to_dict(row) for row in rows]
+
+def retry(key: Optional[str] = None) -> int:
+    """Clear the error and attempt count of one failed job (or all). Returns jobs reset."""
+    with _lock:
+        conn = _connect()
+        if key is None:
+            cursor = conn.execute("UPDATE jobs SET error = '', attempts = 0 WHERE error != ''")
+        else:
+            cursor = conn.execute("UPDATE jobs SET error = '', attempts = 0 WHERE job_key = ?", (key,))
+        conn.commit()
+        return cursor.rowcount
+
+def _print_job(record: dict, verbose: bool = False):
+    status = record["state"] + (f" (failed x{record['attempts']})" if record["error"] else "")
+    print(f"[{status}] {record['citing_title']}")
+    if not verbose:
+        return
+    print(f"  key: {record['job_key']}")
+    print(f"  updated: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record['updated_at']))}")
+    for seed_paper, message_id in record["citations"]:
+        print(f"  cites: {seed_paper} (email {message_id})")
+    if record["paper"]:
+        print(f"  url: {record['paper'].get('entry_id', '')}")
+    if record["error"]:
+        print(f"  error: {record['error']}")
+    print(f"  text: {len(record['content'])} chars, summary: {len(record['summary'])} chars")
+    if record["tldr"]:
+        print(f"  tldr: {record['tldr']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and retry pipeline jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="list jobs")
+    list_parser.add_argument("--state", choices=STATES + ("failed",))
+
+    show_parser = subparsers.add_parser("show", help="show one job in detail")
+    show_parser.add_argument("job", help="job key or paper title")
+
+    retry_parser = subparsers.add_parser("retry", help="reset failed jobs so the next run retries them")
+    retry_parser.add_argument("job", nargs="?", help="job key or paper title")
+    retry_parser.add_argument("--all", action="store_true", help="retry every failed job")
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        jobs = list_jobs(args.state)
+        for record in jobs:
+            _print_job(record)
+        print(f"{len(jobs)} jobs")
+    elif args.command == "show":
+        record = load(job_key(args.job))
+        if record is None:
+            print(f"No job found for: {args.job}")
+            sys.exit(1)
+        _print_job(record, verbose=True)
+    elif args.command == "retry":
+        if not args.all and not args.job:
+            retry_parser.error("give a job or --all")
+        count = retry(None if args.all else job_key(args.job))
+        print(f"[OK] {count} job(s) will be retried on the next run")
@@ -1,14 +1,29 @@
+import asyncio
 import schedule
 import time
 import logging
 import sys
 import io
 from datetime import datetime
-from gmail_handler import get_unread_scholar_emails, get_email_details, extract_paper_titles, mark_email_as_read, clean_paper_title
-from paper_fetcher import search_paper_content, search_paper_abstract
-from summarizer import summarize_paper, generate_tldr
-from notion_handler import add_to_notion_database
-from config import POLL_INTERVAL
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import List, Optional, Tuple
+from gmail_handler import get_new_scholar_emails, commit_sync, get_emails_details, mark_emails_as_read, clean_paper_title
+from alert_parser import AlertPaper, extract_alert_papers
+from paper_fetcher import PaperInfo, resolve_alert_papers, arxiv_id_from_url, shutdown_parse_pool
+from processed_index import is_processed, mark_processed
+import job_journal
+import summary_index
+import push_listener
+import metrics
+import async_engine
+from summarizer import (summarize_paper, generate_tldr, summarize_with_tldr, summarize_batch, summarize_paper_async,
+                        generate_tldr_async, summarize_with_tldr_async)
+from notion_handler import add_to_notion_database, add_many_to_notion_database, add_to_notion_database_async
+from token_budget import count_tokens, fit_to_budget, truncate_to_tokens
+from titles import group_similar_titles, normalize_title
+from config import (POLL_INTERVAL, GMAIL_PUSH_TOPIC, METRICS_PORT, PIPELINE_WORKERS, PIPELINE_ENGINE, COMBINED_SUMMARY, SUMMARY_BATCH_MIN_PAPERS,
+                    SUMMARY_INPUT_TOKENS, SUMMARY_OUTPUT_TOKENS, DEDUP_THRESHOLD, ALERT_PDF_ONLY)
 
 # Setup logging with UTF-8 encoding
 import sys
@@ -29,113 +44,570 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@dataclass(eq=False)
+class PaperJob:
+    """One unique citing paper moving through the fetch → summarize → write stages.
+
+    A paper that cites several seed papers arrives in several alerts; it is
+    fetched and summarized once and written once per (seed_paper, message_id)
+    in `citations`.
+    """
+    citing_title: str
+    paper: Optional[PaperInfo]  # arXiv lookup result, None if not found
+    citations: List[Tuple[str, str]] = field(default_factory=list)
+    link: Optional[AlertPaper] = None  # the alert entry (title link, authors), used to resolve the paper
+    state: str = job_journal.QUEUED  # last completed stage, persisted in the job journal
+    content: str = ""
+    summary: str = ""
+    tldr: str = ""
+
+def fetch_stage(job):
+    """Load the paper's full text, falling back to its abstract. Returns True on success."""
+    logger.info(f"Processing citing paper: {job.citing_title}")
+
+    if job.paper is None:
+        logger.warning(f"Could not find paper content for {job.citing_title}")
+        return False
+
+    job.content = job.paper.full_text()
+    return _prepare_content(job)
+
+def _prepare_content(job):
+    # Fallback to the abstract we already have if full text not available
+    if not job.content:
+        logger.info("Full text not found, using abstract...")
+        job.content = job.paper.abstract
+
+    if not job.content:
+        logger.warning(f"Could not find paper content for {job.citing_title}")
+        return False
+
+    # Drop references/appendix and fit the text to the summarization input budget
+    raw_tokens = count_tokens(job.content)
+    job.content = fit_to_budget(job.content, SUMMARY_INPUT_TOKENS)
+    logger.info(f"Paper text: {raw_tokens} tokens, {count_tokens(job.content)} after budgeting")
+    return True
+
+def summarize_stage(job):
+    """Summarize the paper and produce its TLDR. Returns True on success."""
+    if _reuse_summary(job):
+        return True
+
+    logger.info("Summarizing citing paper...")
+    if COMBINED_SUMMARY:
+        # Summary and TLDR come back from one request
+        job.summary, job.tldr = summarize_with_tldr(job.content)
+    else:
+        job.summary = summarize_paper(job.content)
+
+    if not job.summary:
+        logger.error(f"Failed to summarize paper {job.citing_title}")
+        return False
+
+    if not COMBINED_SUMMARY:
+        # Generate proper one-sentence TLDR
+        logger.info("Generating TLDR...")
+        job.tldr = generate_tldr(job.content, job.summary)
+
+    _ensure_tldr(job)
+    _index_summary(job)
+    return True
+
+def _reuse_summary(job):
+    """Take the stored summary of an earlier version of this paper, if the summary index has one."""
+    match = summary_index.find_reusable(job.paper.title or job.citing_title, job.paper.abstract,
+                                        job.paper.arxiv_id)
+    if match is None:
+        return False
+    logger.info(f"Reusing the summary of '{match.title}' (similarity {match.score:.2f})")
+    job.summary, job.tldr = match.summary, match.tldr
+    _ensure_tldr(job)
+    return True
+
+def _index_summary(job):
+    summary_index.add(job.paper.title or job.citing_title, job.paper.abstract, job.paper.arxiv_id,
+                      job.summary, job.tldr)
+
+def _ensure_tldr(job):
+    if not job.tldr:
+        # Fallback: use first sentence if TLDR generation or parsing fails
+        sentences = job.summary.split('.')
+        tldr = sentences[0].strip() if sentences and sentences[0].strip() else job.summary[:150]
+        if tldr and not tldr.endswith('.'):
+            tldr = tldr + '.'
+        job.tldr = tldr
+
+def _notion_entries(job):
+    """One Notion row per seed paper, all sharing the same summary."""
+    # Truncate summary to the Notion token budget (1200 tokens by default)
+    summary_truncated = truncate_to_tokens(job.summary, SUMMARY_OUTPUT_TOKENS)
+    return [
+        dict(
+            seed_paper=seed_paper,
+            citing_title=job.citing_title,
+            summary=summary_truncated,
+            tldr=job.tldr,
+            gmail_msg_id=message_id,
+            citing_url=job.paper.entry_id,
+            authors=job.paper.authors
+        )
+        for seed_paper, message_id in job.citations
+    ]
+
+def _record_write(job, entry, added):
+    if added:
+        logger.info(f"Successfully added to Notion: {job.citing_title}")
+        mark_processed(job.citing_title, entry["seed_paper"], arxiv_id_from_url(job.paper.entry_id),
+                       entry["gmail_msg_id"])
+    else:
+        logger.error(f"Failed to add to Notion for {job.citing_title}")
+    return added
+
+def write_stage(job):
+    """Add the summarized paper to Notion. Returns True on success."""
+    success = True
+    for entry in _notion_entries(job):
+        logger.info(f"Adding to Notion database (seed paper: {entry['seed_paper']})...")
+        added = _record_write(job, entry, add_to_notion_database(**entry))
+        success = success and added
+    return success
+
+def write_bulk_stage(jobs):
+    """Write every row for many summarized papers in one rate-limited bulk run."""
+    rows = [(job, entry) for job in jobs for entry in _notion_entries(job)]
+    logger.info(f"Bulk writing {len(rows)} rows to Notion...")
+    with metrics.span("stage.write_bulk", paper=""):
+        results = add_many_to_notion_database([entry for _, entry in rows])
+
+    succeeded = {job: True for job in jobs}
+    for (job, entry), added in zip(rows, results):
+        succeeded[job] = _record_write(job, entry, added) and succeeded[job]
+
+    for job in jobs:
+        if succeeded[job]:
+            job.state = job_journal.WRITTEN
+            checkpoint(job)
+        else:
+            checkpoint(job, "write_bulk_stage failed")
+
+def checkpoint(job, error=""):
+    """Save the job's state and artifacts to the journal."""
+    paper = {"title": job.paper.title, **job.paper.to_metadata()} if job.paper else None
+    job_journal.save(
+        job_journal.job_key(job.citing_title), job.citing_title, job.citations, job.state,
+        paper=paper, content=job.content, summary=job.summary, tldr=job.tldr, error=error
+    )
+
+def advance(job, stage, next_state):
+    """Run one stage and checkpoint the outcome. Returns True on success.
+
+    Never lets one paper's exception escape into the pool.
+    """
+    # Spans of the calls made by this stage are attributed to this paper
+    with metrics.current_paper(job.citing_title), \
+            metrics.span("stage." + stage.__name__.replace("_stage", "")) as span:
+        try:
+            success = stage(job)
+            error = "" if success else f"{stage.__name__} failed"
+        except Exception as e:
+            logger.error(f"Error processing {job.citing_title}: {e}", exc_info=True)
+            success, error = False, f"{stage.__name__}: {e}"
+        span.ok, span.error = success, error
+
+    if success:
+        job.state = next_state
+    checkpoint(job, error)
+    return success
+
+# (state the stage starts from, stage, state after it succeeds)
+STAGES = [
+    (job_journal.QUEUED, fetch_stage, job_journal.FETCHED),
+    (job_journal.FETCHED, summarize_stage, job_journal.SUMMARIZED),
+    (job_journal.SUMMARIZED, write_stage, job_journal.WRITTEN),
+]
+
+def process_citing_paper(job):
+    """Fetch, summarize and add one citing paper to Notion, resuming from job.state.
+
+    Returns True once the paper is written.
+    """
+    for start_state, stage, next_state in STAGES:
+        if job.state == start_state and not advance(job, stage, next_state):
+            return False
+    return job.state == job_journal.WRITTEN
+
+# The async engine (PIPELINE_ENGINE=async) runs the same stages as coroutines
+# on the run's shared clients (see async_engine.py)
+
+async def fetch_stage_async(job, clients):
+    """fetch_stage, downloading over the run's shared HTTP client."""
+    logger.info(f"Processing citing paper: {job.citing_title}")
+
+    if job.paper is None:
+        logger.warning(f"Could not find paper content for {job.citing_title}")
+        return False
+
+    job.content = await job.paper.full_text_async(clients.http)
+    return _prepare_content(job)
+
+async def summarize_stage_async(job, clients):
+    """summarize_stage on the run's AsyncAnthropic client."""
+    if _reuse_summary(job):
+        return True
+
+    logger.info("Summarizing citing paper...")
+    if COMBINED_SUMMARY:
+        job.summary, job.tldr = await summarize_with_tldr_async(clients.anthropic, job.content)
+    else:
+        job.summary = await summarize_paper_async(clients.anthropic, job.content)
+
+    if not job.summary:
+        logger.error(f"Failed to summarize paper {job.citing_title}")
+        return False
+
+    if not COMBINED_SUMMARY:
+        logger.info("Generating TLDR...")
+        job.tldr = await generate_tldr_async(clients.anthropic, job.content, job.summary)
+
+    _ensure_tldr(job)
+    _index_summary(job)
+    return True
+
+async def write_stage_async(job, clients):
+    """write_stage on the run's Notion client, writing the paper's rows concurrently."""
+    entries = _notion_entries(job)
+    for entry in entries:
+        logger.info(f"Adding to Notion database (seed paper: {entry['seed_paper']})...")
+    results = await asyncio.gather(*(add_to_notion_database_async(clients.notion, **entry) for entry in entries))
+    return all([_record_write(job, entry, added) for entry, added in zip(entries, results)])
+
+async def advance_async(job, stage, next_state, clients):
+    """advance() for the async stages."""
+    with metrics.current_paper(job.citing_title), \
+            metrics.span("stage." + stage.__name__.replace("_stage_async", "")) as span:
+        try:
+            success = await stage(job, clients)
+            error = "" if success else f"{stage.__name__} failed"
+        except Exception as e:
+            logger.error(f"Error processing {job.citing_title}: {e}", exc_info=True)
+            success, error = False, f"{stage.__name__}: {e}"
+        span.ok, span.error = success, error
+
+    if success:
+        job.state = next_state
+    checkpoint(job, error)
+    return success
+
+ASYNC_STAGES = [
+    (job_journal.QUEUED, fetch_stage_async, job_journal.FETCHED),
+    (job_journal.FETCHED, summarize_stage_async, job_journal.SUMMARIZED),
+    (job_journal.SUMMARIZED, write_stage_async, job_journal.WRITTEN),
+]
+
+async def process_citing_paper_async(job, clients):
+    """process_citing_paper for the async engine."""
+    for start_state, stage, next_state in ASYNC_STAGES:
+        if job.state == start_state and not await advance_async(job, stage, next_state, clients):
+            return False
+    return job.state == job_journal.WRITTEN
+
+def summarize_batch_stage(jobs):
+    """Summarize many fetched papers through the Message Batches API.
+
+    Papers with a reusable summary in the summary index are left out of the
+    batch. Papers the batch couldn't summarize are left in the FETCHED state
+    for the caller to summarize on the interactive path.
+    """
+    pending = []
+    for job in jobs:
+        if _reuse_summary(job):
+            job.state = job_journal.SUMMARIZED
+            checkpoint(job)
+        else:
+            pending.append(job)
+    if not pending:
+        return
+    jobs = pending
+
+    logger.info(f"Submitting {len(jobs)} papers as a message batch...")
+    with metrics.span("stage.summarize_batch", paper=""):
+        results = summarize_batch([job.content for job in jobs])
+
+    for job, (summary, tldr) in zip(jobs, results):
+        if summary:
+            job.summary, job.tldr = summary, tldr
+            _ensure_tldr(job)
+            _index_summary(job)
+            job.state = job_journal.SUMMARIZED
+            checkpoint(job)
+        else:
+            logger.warning(f"Batch summary missing for {job.citing_title}, will retry directly")
+
+def _run_jobs_batched(executor, jobs):
+    """Backlog mode: fetch in parallel, summarize everything in one batch, then write.
+
+    Returns a success flag per job, in order.
+    """
+    to_fetch = [job for job in jobs if job.state == job_journal.QUEUED]
+    list(executor.map(lambda job: advance(job, fetch_stage, job_journal.FETCHED), to_fetch))
+
+    to_summarize = [job for job in jobs if job.state == job_journal.FETCHED]
+    if to_summarize:
+        summarize_batch_stage(to_summarize)
+    # Papers the batch missed go through the normal summarize stage on the pool
+    retry = [job for job in to_summarize if job.state == job_journal.FETCHED]
+    list(executor.map(lambda job: advance(job, summarize_stage, job_journal.SUMMARIZED), retry))
+
+    to_write = [job for job in jobs if job.state == job_journal.SUMMARIZED]
+    if to_write:
+        write_bulk_stage(to_write)
+    return [job.state == job_journal.WRITTEN for job in jobs]
+
+def build_jobs(alerts):
+    """Deduplicate the citing papers of a polling cycle into jobs.
+
+    `alerts` holds (message_id, seed_paper, citing_papers) per email, with
+    citing papers as AlertPaper entries. Titles are grouped by normalized/fuzzy match (DEDUP_THRESHOLD), so each unique
+    paper gets one job carrying all of its (seed_paper, message_id) pairs.
+    Returns (jobs, jobs_by_email) where jobs_by_email lists, per email in
+    order, the jobs that email is waiting on.
+    """
+    pairs = [
+        (paper, seed_paper, message_id)
+        for message_id, seed_paper, citing_papers in alerts
+        for paper in citing_papers
+    ]
+    groups = group_similar_titles([paper.title for paper, _, _ in pairs], DEDUP_THRESHOLD)
+
+    jobs = []
+    job_for_pair = {}
+    for group in groups:
+        links = [pairs[index][0] for index in group]
+        # Prefer an entry that links to arXiv, then any direct PDF link
+        link = max(links, key=lambda paper: (bool(arxiv_id_from_url(paper.url)), paper.has_pdf))
+        job = PaperJob(citing_title=links[0].title, paper=None, link=link)
+        seen_seeds = set()
+        for index in group:
+            _, seed_paper, message_id = pairs[index]
+            job_for_pair[index] = job
+            # The same seed reported twice (e.g. duplicate alerts) is one row
+            if normalize_title(seed_paper) not in seen_seeds:
+                seen_seeds.add(normalize_title(seed_paper))
+                job.citations.append((seed_paper, message_id))
+        jobs.append(job)
+
+    jobs_by_email = []
+    for message_id, _, _ in alerts:
+        email_jobs = []
+        for index, (_, _, pair_message_id) in enumerate(pairs):
+            job = job_for_pair[index]
+            if pair_message_id == message_id and job not in email_jobs:
+                email_jobs.append(job)
+        jobs_by_email.append((message_id, email_jobs))
+
+    if len(jobs) < len(pairs):
+        logger.info(f"Deduplicated {len(pairs)} citing papers into {len(jobs)} unique papers")
+    return jobs, jobs_by_email
+
+def _merge_citations(job, citations):
+    seeds = {normalize_title(seed_paper) for seed_paper, _ in job.citations}
+    for seed_paper, message_id in citations:
+        if normalize_title(seed_paper) not in seeds:
+            seeds.add(normalize_title(seed_paper))
+            job.citations.append((seed_paper, message_id))
+
+def _restore(job, record):
+    """Load journal progress and artifacts into a job."""
+    _merge_citations(job, record["citations"])
+    job.content, job.summary, job.tldr = record["content"], record["summary"], record["tldr"]
+    if record["paper"]:
+        job.paper = PaperInfo(**record["paper"])
+    # A written job only comes back for new seed papers: reuse its summary
+    job.state = job_journal.SUMMARIZED if record["state"] == job_journal.WRITTEN else record["state"]
+
+def resume_jobs(jobs):
+    """Merge journal progress into this run's jobs and add unfinished jobs from earlier runs.
+
+    Returns the combined job list.
+    """
+    by_key = {}
+    for job in jobs:
+        key = job_journal.job_key(job.citing_title)
+        by_key[key] = job
+        record = job_journal.load(key)
+        if record is not None:
+            _restore(job, record)
+
+    resumed = []
+    for record in job_journal.pending():
+        if record["job_key"] in by_key:
+            continue
+        job = PaperJob(citing_title=record["citing_title"], paper=None)
+        _restore(job, record)
+        resumed.append(job)
+
+    if resumed:
+        logger.info(f"Resuming {len(resumed)} unfinished papers from earlier runs")
+    return jobs + resumed
+
+def drop_processed_citations(jobs):
+    """Remove citations already recorded in the processed index.
+
+    Jobs left without citations need no work at all. Returns the jobs that
+    still have something to write.
+    """
+    pending = []
+    for job in jobs:
+        arxiv_id = arxiv_id_from_url(job.paper.entry_id) if job.paper else ""
+        remaining = [
+            (seed_paper, message_id) for seed_paper, message_id in job.citations
+            if not is_processed(job.citing_title, seed_paper, arxiv_id)
+        ]
+        if len(remaining) < len(job.citations):
+            logger.info(f"Already in Notion, skipping {len(job.citations) - len(remaining)} row(s): {job.citing_title}")
+        if not remaining and job.state != job_journal.WRITTEN and job_journal.load(job_journal.job_key(job.citing_title)):
+            # Written before the journal caught up (e.g. crash right after the Notion call)
+            job.state = job_journal.WRITTEN
+            checkpoint(job)
+        job.citations = remaining
+        if remaining:
+            pending.append(job)
+    return pending
+
+def _finish_email(message_id, results):
+    logger.info(f"Successfully processed email {message_id} ({sum(results)}/{len(results)} papers added)")
+
 def process_scholar_emails():
-    """Main function to process Google Scholar emails."""
+    """Main function to process Google Scholar emails.
+
+    Citing papers from all emails are processed in parallel on a bounded
+    thread pool (PIPELINE_WORKERS), or with PIPELINE_ENGINE=async as tasks
+    on one event loop, with per-stage limits from STAGE_LIMITS.
+    Emails are marked as read together once all of their papers have finished.
+    """
     logger.info("Starting email processing...")
+    metrics.start_run()
 
     try:
-        emails = get_unread_scholar_emails()
+        emails, sync_token = get_new_scholar_emails()
     except Exception as e:
         logger.error(f"Error fetching emails: {e}", exc_info=True)
         return
 
     if not emails:
-        logger.info("No unread emails from Google Scholar")
-        return
+        # Still worth continuing: unfinished papers from earlier runs are resumed
+        logger.info("No new emails from Google Scholar")
+        emails = []
+    else:
+        logger.info(f"Found {len(emails)} new emails")
+
+    # (message_id, seed_paper, citing_papers) for every email with papers to process
+    alerts = []
+    # Emails to mark as read in one call at the end of the run
+    finished_emails = []
 
-    logger.info(f"Found {len(emails)} unread emails")
+    # Get email details for all emails in a few batch requests
+    all_details = get_emails_details([email['id'] for email in emails])
 
     for email in emails:
         message_id = email['id']
         logger.info(f"Processing email: {message_id}")
 
-        # Get email details
-        email_details = get_email_details(message_id)
+        email_details = all_details.get(message_id)
         if not email_details:
             logger.error(f"Failed to get email details for {message_id}")
             continue
 
         logger.info(f"Subject: {email_details['subject']}")
 
-        # Extract both seed paper and citing papers (now returns a list)
-        seed_paper, citing_papers = extract_paper_titles(email_details['body'])
+        # Extract the seed paper and the citing papers with their links
+        seed_paper, citing_papers = extract_alert_papers(email_details['body'])
+        if ALERT_PDF_ONLY:
+            citing_papers = [paper for paper in citing_papers if paper.has_pdf]
 
         if not seed_paper:
             logger.warning(f"Could not extract seed paper from email {message_id}")
-            mark_email_as_read(message_id)
+            finished_emails.append(message_id)
             continue
 
         if not citing_papers:
             logger.warning(f"Could not extract citing papers from email {message_id}")
-            mark_email_as_read(message_id)
+            finished_emails.append(message_id)
             continue
 
         logger.info(f"Seed paper: {seed_paper}")
         logger.info(f"Found {len(citing_papers)} citing papers")
+        alerts.append((message_id, seed_paper, citing_papers))
+
+    # Fetch and summarize each unique citing paper once, however many alerts it is in
+    all_jobs, jobs_by_email = build_jobs(alerts)
+
+    # Pick up journal progress, including papers a previous run didn't finish
+    job_journal.prune()
+    all_jobs = resume_jobs(all_jobs)
+
+    # Skip papers that already made it into Notion (e.g. before a crash)
+    pending_jobs = drop_processed_citations(all_jobs)
+
+    # Resolve every new citing paper of this cycle from its alert link (arXiv id
+    # or direct PDF), searching arXiv by title only for other links
+    to_resolve = [job for job in pending_jobs if job.paper is None and job.state == job_journal.QUEUED]
+    if to_resolve:
+        logger.info(f"Resolving {len(to_resolve)} citing papers...")
+        resolved = resolve_alert_papers([
+            replace(job.link, title=job.citing_title) if job.link else AlertPaper(title=job.citing_title)
+            for job in to_resolve
+        ])
+        for job, paper in zip(to_resolve, resolved):
+            job.paper = paper
+
+    # Same check again now that arXiv ids are known
+    pending_jobs = drop_processed_citations(pending_jobs)
+    for job in pending_jobs:
+        checkpoint(job)
+
+    # Jobs with nothing left to do count as done
+    results = {id(job): True for job in all_jobs}
+    use_batch = 0 < SUMMARY_BATCH_MIN_PAPERS <= len(pending_jobs)
 
-        # Process each citing paper
-        for citing_title in citing_papers:
-            logger.info(f"Processing citing paper: {citing_title}")
-
-            # Search for the CITING paper content (the new paper)
-            logger.info("Searching for citing paper content...")
-            paper_content, paper_url, authors = search_paper_content(citing_title)
-
-            # Fallback to abstract if full text not available
-            if not paper_content:
-                logger.info("Full text not found, trying abstract...")
-                paper_content, paper_url, authors = search_paper_abstract(citing_title)
-
-            if not paper_content:
-                logger.warning(f"Could not find paper content for {citing_title}")
-                continue
-
-            logger.info("Summarizing citing paper...")
-            summary = summarize_paper(paper_content)
-
-            if not summary:
-                logger.error(f"Failed to summarize paper {citing_title}")
-                continue
-
-            # Generate proper one-sentence TLDR
-            logger.info("Generating TLDR...")
-            tldr = generate_tldr(paper_content, summary)
-            if not tldr:
-                # Fallback: use first sentence if TLDR generation fails
-                sentences = summary.split('.')
-                tldr = sentences[0].strip() if sentences and sentences[0].strip() else summary[:150]
-                if tldr and not tldr.endswith('.'):
-                    tldr = tldr + '.'
-
-            # Truncate summary to 1200 tokens (approximately 4800 characters for plain text)
-            summary_truncated = summary[:4800]
-
-            logger.info("Adding to Notion database...")
-            success = add_to_notion_database(
-                seed_paper=seed_paper,
-                citing_title=citing_title,
-                summary=summary_truncated,
-                tldr=tldr,
-                gmail_msg_id=message_id,
-                citing_url=paper_url,
-                authors=authors
-            )
-
-            if success:
-                logger.info(f"Successfully added to Notion: {citing_title}")
+    if PIPELINE_ENGINE == "async" and not use_batch:
+        # All papers in flight on one event loop, sharing pooled connections
+        results.update(zip(map(id, pending_jobs), async_engine.run_jobs(pending_jobs, process_citing_paper_async)))
+        for message_id, jobs in jobs_by_email:
+            _finish_email(message_id, [results[id(job)] for job in jobs])
+            finished_emails.append(message_id)
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, PIPELINE_WORKERS)) as executor:
+            if use_batch:
+                results.update(zip(map(id, pending_jobs), _run_jobs_batched(executor, pending_jobs)))
+                for message_id, jobs in jobs_by_email:
+                    _finish_email(message_id, [results[id(job)] for job in jobs])
+                    finished_emails.append(message_id)
             else:
-                logger.error(f"Failed to add to Notion for {citing_title}")
+                futures = {id(job): executor.submit(process_citing_paper, job) for job in pending_jobs}
+                # Emails are finished in order, each as soon as all of its papers are done
+                for message_id, jobs in jobs_by_email:
+                    _finish_email(message_id, [
+                        futures[id(job)].result() if id(job) in futures else results[id(job)]
+                        for job in jobs
+                    ])
+                    finished_emails.append(message_id)
 
-        # Mark email as read after processing all papers
-        mark_email_as_read(message_id)
-        logger.info(f"Successfully processed email {message_id}")
+    # Mark all processed emails as read at once; papers are journaled, so a
+    # crash before this point only means the emails are parsed again
+    mark_emails_as_read(finished_emails)
+    finished = set(finished_emails)
+    commit_sync(sync_token, [email['id'] for email in emails if email['id'] not in finished])
 
+    # Per-stage timings, throughput and cache hit rates for this run
+    written = sum(1 for job in pending_jobs if job.state == job_journal.WRITTEN)
+    logger.info(metrics.format_summary(metrics.finish_run(written)))
     logger.info("Email processing completed")
 
 def schedule_jobs():
     """Schedule the email processing job."""
-    schedule.every(6).hours.do(process_scholar_emails)
-    logger.info(f"Scheduled email processing every 6 hours")
+    schedule.every(POLL_INTERVAL).seconds.do(process_scholar_emails)
+    logger.info(f"Scheduled email processing every {POLL_INTERVAL / 3600:g} hours")
 
     # Run immediately on startup
     process_scholar_emails()
@@ -143,13 +615,22 @@ def schedule_jobs():
     # Keep scheduler running
     while True:
         schedule.run_pending()
-        time.sleep(60)
+        time.sleep(min(60, POLL_INTERVAL))
 
 if __name__ == "__main__":
     logger.info("Starting GS2Notion automation...")
+    if METRICS_PORT:
+        metrics.start_metrics_server(METRICS_PORT)
     try:
-        schedule_jobs()
+        if GMAIL_PUSH_TOPIC:
+            # Event-driven: process new alerts as Gmail pushes them, polling as a fallback
+            push_listener.run(process_scholar_emails)
+        else:
+            schedule_jobs()
     except KeyboardInterrupt:
         logger.info("Shutting down...")
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
+    finally:
+        # Stop the PDF parsing worker processes (PDF_PARSE_WORKERS)
+        shutdown_parse_pool()
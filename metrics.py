@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+"""
+Per-stage timing spans and run summaries.
+
+Each external call or pipeline stage is recorded as a span: stage name,
+paper, duration and whatever sizes apply (bytes, tokens, retries). Spans
+are appended to METRICS_FILE as JSON lines (moved to METRICS_FILE.1 once
+it reaches METRICS_MAX_BYTES), and at the end of a run a summary with
+p50/p95 per stage, papers per minute and cache hit rates is logged and
+appended as a "run" record. With METRICS_PORT set, the same
+numbers (since process start) are served in Prometheus text format.
+
+Summarize an existing metrics file with:
+    python metrics.py [--file .gs2notion/metrics.jsonl]
+"""
+
+import argparse
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from config import METRICS_FILE, METRICS_MAX_BYTES, METRICS_PORT
+
+_lock = threading.Lock()
+# A context variable rather than a thread-local, so it also follows asyncio tasks
+_current_paper = contextvars.ContextVar("current_paper", default="")
+
+# Since process start, for the Prometheus endpoint
+_totals: Dict[str, dict] = {}
+_counters: Dict[str, float] = {}
+
+# Current run, for its summary
+_run_spans: List[dict] = []
+_run_counters: Dict[str, float] = {}
+_run_started = None
+
+class Span:
+    """A timed operation. Set bytes/tokens/retries on it while it runs."""
+
+    def __init__(self, stage: str, paper: str = ""):
+        self.stage = stage
+        self.paper = paper
+        self.bytes = 0
+        self.tokens = 0
+        self.retries = 0
+        self.ok = True
+        self.error = ""
+
+@contextmanager
+def current_paper(title: str):
+    """Attribute spans recorded on this thread (or asyncio task) to `title` while inside the block."""
+    token = _current_paper.set(title)
+    try:
+        yield
+    finally:
+        _current_paper.reset(token)
+
+@contextmanager
+def span(stage: str, paper: Optional[str] = None):
+    """Time the block as one span of `stage`. An exception marks it failed and propagates."""
+    current = Span(stage, paper if paper is not None else _current_paper.get())
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.ok, current.error = False, f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        _record(current, time.perf_counter() - started)
+
+def count(name: str, value: float = 1):
+    """Add to a named counter (e.g. cache hits)."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+        _run_counters[name] = _run_counters.get(name, 0) + value
+
+def _record(current: Span, duration: float):
+    record = {
+        "ts": time.time(),
+        "stage": current.stage,
+        "paper": current.paper,
+        "duration": round(duration, 6),
+        "bytes": current.bytes,
+        "tokens": current.tokens,
+        "retries": current.retries,
+        "ok": current.ok,
+    }
+    if current.error:
+        record["error"] = current.error
+
+    with _lock:
+        _run_spans.append(record)
+        totals = _totals.setdefault(current.stage, {
+            "count": 0, "errors": 0, "seconds": 0.0, "bytes": 0, "tokens": 0, "retries": 0,
+            "recent": deque(maxlen=1000)
+        })
+        totals["count"] += 1
+        totals["errors"] += 0 if current.ok else 1
+        totals["seconds"] += duration
+        totals["bytes"] += current.bytes
+        totals["tokens"] += current.tokens
+        totals["retries"] += current.retries
+        # Quantiles for the endpoint come from the most recent durations
+        totals["recent"].append(duration)
+    _write(record)
+
+def _write(record: dict):
+    if not METRICS_FILE:
+        return
+    try:
+        directory = os.path.dirname(METRICS_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(record)
+        with _lock:
+            _rotate()
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        print(f"Error writing metrics: {e}")
+
+def _rotate():
+    """Move a full METRICS_FILE to METRICS_FILE.1 (replacing the previous one). Call with _lock held."""
+    if METRICS_MAX_BYTES <= 0:
+        return
+    try:
+        if os.path.getsize(METRICS_FILE) >= METRICS_MAX_BYTES:
+            os.replace(METRICS_FILE, METRICS_FILE + ".1")
+    except FileNotFoundError:
+        pass
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(spans: List[dict], counters: Dict[str, float], elapsed: float, papers: int) -> dict:
+    """Per-stage count/p50/p95/totals, throughput and cache hit rates."""
+    stages = {}
+    for record in spans:
+        stages.setdefault(record["stage"], []).append(record)
+
+    summary = {"elapsed": round(elapsed, 3), "papers": papers,
+               "papers_per_minute": round(papers / elapsed * 60, 2) if elapsed > 0 else 0.0,
+               "stages": {}, "counters": dict(counters), "cache_hit_rate": {}}
+    for stage, records in sorted(stages.items()):
+        durations = sorted(record["duration"] for record in records)
+        summary["stages"][stage] = {
+            "count": len(records),
+            "errors": sum(1 for record in records if not record["ok"]),
+            "p50": round(_percentile(durations, 0.5), 4),
+            "p95": round(_percentile(durations, 0.95), 4),
+            "total": round(sum(durations), 3),
+            "bytes": sum(record["bytes"] for record in records),
+            "tokens": sum(record["tokens"] for record in records),
+            "retries": sum(record["retries"] for record in records),
+        }
+
+    # "cache.<name>.hit" / "cache.<name>.miss" counter pairs; a cache that only
+    # missed is listed too (at 0%)
+    caches = sorted({name[len("cache."):].rpartition(".")[0] for name in counters
+                     if name.startswith("cache.") and name.endswith((".hit", ".miss"))})
+    for cache in caches:
+        hits, misses = counters.get(f"cache.{cache}.hit", 0), counters.get(f"cache.{cache}.miss", 0)
+        summary["cache_hit_rate"][cache] = round(hits / (hits + misses), 3) if hits + misses else 0.0
+    return summary
+
+def format_summary(summary: dict) -> str:
+    lines = [f"Run: {summary['papers']} papers in {summary['elapsed']:.1f}s "
+             f"({summary['papers_per_minute']:.2f} papers/min)"]
+    for stage, stats in summary["stages"].items():
+        extra = "".join(f", {stats[key]} {key}" for key in ("bytes", "tokens", "retries", "errors") if stats[key])
+        lines.append(f"  {stage:<22} n={stats['count']:<4} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s "
+                     f"total={stats['total']:.1f}s{extra}")
+    for cache, rate in summary["cache_hit_rate"].items():
+        lines.append(f"  cache {cache}: {rate:.0%} hits")
+    return "\n".join(lines)
+
+def start_run():
+    """Begin a new run: spans and counters from here on go into its summary."""
+    global _run_started
+    with _lock:
+        _run_spans.clear()
+        _run_counters.clear()
+        _run_started = time.time()
+
+def finish_run(papers: int) -> dict:
+    """Summarize the current run, append it to METRICS_FILE and return it."""
+    with _lock:
+        spans, counters = list(_run_spans), dict(_run_counters)
+        started = _run_started or time.time()
+    summary = summarize(spans, counters, time.time() - started, papers)
+    _write({"ts": time.time(), "run": summary})
+    return summary
+
+def prometheus_text() -> str:
+    """Process-lifetime metrics in Prometheus text exposition format."""
+    lines = [
+        "# TYPE gs2notion_stage_seconds summary",
+    ]
+    with _lock:
+        totals = {stage: dict(values, recent=sorted(values["recent"])) for stage, values in _totals.items()}
+        counters = dict(_counters)
+
+    for stage, values in sorted(totals.items()):
+        label = f'stage="{stage}"'
+        recent = values["recent"]
+        for quantile in (0.5, 0.95):
+            lines.append(f'gs2notion_stage_seconds{{{label},quantile="{quantile}"}} {_percentile(recent, quantile):.6f}')
+        lines.append(f"gs2notion_stage_seconds_sum{{{label}}} {values['seconds']:.6f}")
+        lines.append(f"gs2notion_stage_seconds_count{{{label}}} {values['count']}")
+    for key in ("errors", "bytes", "tokens", "retries"):
+        lines.append(f"# TYPE gs2notion_stage_{key}_total counter")
+        for stage, values in sorted(totals.items()):
+            lines.append(f'gs2notion_stage_{key}_total{{stage="{stage}"}} {values[key]}')
+    lines.append("# TYPE gs2notion_events_total counter")
+    for name, value in sorted(counters.items()):
+        lines.append(f'gs2notion_events_total{{name="{name}"}} {value:g}')
+    return "\n".join(lines) + "\n"
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0"):
+    """Serve /metrics in a background thread. Returns the server."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            data = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a metrics file")
+    parser.add_argument("--file", default=METRICS_FILE)
+    parser.add_argument("--runs", action="store_true", help="also print each recorded run summary")
+    args = parser.parse_args()
+
+    spans, counters = [], {}
+    elapsed, papers = 0.0, 0
+    with open(args.file, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if "run" not in record:
+                spans.append(record)
+                continue
+            run = record["run"]
+            elapsed += run["elapsed"]
+            papers += run["papers"]
+            for name, value in run["counters"].items():
+                counters[name] = counters.get(name, 0) + value
+            if args.runs:
+                print(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["ts"])))
+                print(format_summary(run))
+
+    print(f"All runs in {args.file}:")
+    print(format_summary(summarize(spans, counters, elapsed, papers)))
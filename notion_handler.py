@@ -1,8 +1,216 @@
-from notion_client import Client
-from config import NOTION_API_KEY, NOTION_DATABASE_ID
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import httpx
+from notion_client import AsyncClient, Client
+from notion_client.errors import APIErrorCode, APIResponseError, RequestTimeoutError
+from config import (NOTION_API_KEY, NOTION_DATABASE_ID, NOTION_BASE_URL, NOTION_RATE_LIMIT, NOTION_MAX_RETRIES,
+                    STAGE_LIMITS)
 from datetime import datetime
+from concurrency import stage_slot, stage_slot_async
+from rate_limit import TokenBucket
+import metrics
+import resilience
 
-notion = Client(auth=NOTION_API_KEY)
+notion = Client(auth=NOTION_API_KEY, base_url=NOTION_BASE_URL)
+
+def async_client(http_client: httpx.AsyncClient) -> AsyncClient:
+    """A long-lived async client on a pooled connection, for the async engine.
+
+    notion_client sets its base URL and headers on `http_client`, so it
+    can't be shared with other services.
+    """
+    return AsyncClient(auth=NOTION_API_KEY, base_url=NOTION_BASE_URL, client=http_client)
+
+# Shared by every thread so the whole process stays under Notion's rate limit
+_rate_limiter = TokenBucket(NOTION_RATE_LIMIT)
+
+# Notion accepts at most 100 child blocks per request
+_MAX_BLOCKS_PER_REQUEST = 100
+
+_RETRYABLE_CODES = {
+    APIErrorCode.RateLimited,
+    APIErrorCode.ConflictError,
+    APIErrorCode.InternalServerError,
+    APIErrorCode.ServiceUnavailable,
+}
+
+def _is_retryable(error) -> bool:
+    if isinstance(error, APIResponseError) and error.code in _RETRYABLE_CODES:
+        return True
+    return isinstance(error, RequestTimeoutError) or resilience.is_transient(error)
+
+def _is_unsent(error) -> bool:
+    """Whether an error guarantees the request was never applied: rate limited, or no connection was made."""
+    return getattr(error, "status", None) == 429 or isinstance(error, (httpx.ConnectError, ConnectionRefusedError))
+
+def _endpoint_name(method) -> str:
+    # e.g. PagesEndpoint.create -> notion.pages.create
+    return "notion." + getattr(method, "__qualname__", "request").replace("Endpoint", "").lower()
+
+def _on_retry(error, delay):
+    if getattr(error, "status", None) == 429:
+        _rate_limiter.pause(delay)
+
+def _call_notion(method, retryable=_is_retryable, **kwargs):
+    """Call a Notion API method under the rate limiter, retrying transient errors.
+
+    A 429 pauses the shared limiter for the Retry-After period so that every
+    thread backs off, not just this one.
+    """
+    def attempt():
+        _rate_limiter.acquire()
+        with stage_slot("notion"):
+            return method(**kwargs)
+
+    with metrics.span(_endpoint_name(method)) as span:
+        return resilience.call("notion", attempt, retryable=retryable, max_attempts=NOTION_MAX_RETRIES + 1,
+                               on_retry=_on_retry, span=span)
+
+async def _call_notion_async(method, retryable=_is_retryable, **kwargs):
+    """_call_notion for an AsyncClient method, sharing the same rate limiter."""
+    async def attempt():
+        await _rate_limiter.acquire_async()
+        async with stage_slot_async("notion"):
+            return await method(**kwargs)
+
+    with metrics.span(_endpoint_name(method)) as span:
+        return await resilience.call_async("notion", attempt, retryable=retryable,
+                                           max_attempts=NOTION_MAX_RETRIES + 1, on_retry=_on_retry, span=span)
+
+def _page_properties(seed_paper: str, citing_title: str, tldr: str, gmail_msg_id: str, citing_url: str) -> dict:
+    # Truncate fields to Notion's limits
+    page_title = citing_title[:100] if citing_title else ""
+    seed_paper_truncated = seed_paper[:100] if seed_paper else ""
+    tldr_truncated = tldr[:500] if tldr else ""
+
+    properties = {
+        "title": {
+            "title": [
+                {
+                    "text": {
+                        "content": page_title
+                    }
+                }
+            ]
+        },
+        "seed_paper": {
+            "rich_text": [
+                {
+                    "text": {
+                        "content": seed_paper_truncated
+                    }
+                }
+            ]
+        },
+        "TLDR": {
+            "rich_text": [
+                {
+                    "text": {
+                        "content": tldr_truncated
+                    }
+                }
+            ]
+        },
+        "Gmail Msg ID": {
+            "rich_text": [
+                {
+                    "text": {
+                        "content": gmail_msg_id
+                    }
+                }
+            ]
+        },
+        "date_received": {
+            "date": {
+                "start": datetime.now().isoformat()
+            }
+        }
+    }
+
+    # Add URL if provided
+    if citing_url:
+        properties["url"] = {
+            "url": citing_url
+        }
+    return properties
+
+def _page_filter(properties: dict) -> dict:
+    """A database query filter matching the page `properties` would create."""
+    title = properties["title"]["title"][0]["text"]["content"]
+    gmail_msg_id = properties["Gmail Msg ID"]["rich_text"][0]["text"]["content"]
+    conditions = [{"property": "title", "title": {"equals": title}}]
+    if gmail_msg_id:
+        conditions.append({"property": "Gmail Msg ID", "rich_text": {"equals": gmail_msg_id}})
+    return {"and": conditions}
+
+def _create_page(properties: dict, children: list) -> dict:
+    """pages.create, without creating the page twice.
+
+    The request is only retried as is when it can't have been applied (429,
+    connection never made). After a timeout, 5xx or 409 the page may exist
+    anyway, so the database is searched for it before creating it again.
+    """
+    for attempt in range(NOTION_MAX_RETRIES + 1):
+        try:
+            return _call_notion(notion.pages.create, retryable=_is_unsent,
+                                parent={"database_id": NOTION_DATABASE_ID}, properties=properties, children=children)
+        except Exception as e:
+            if not _is_retryable(e) or attempt == NOTION_MAX_RETRIES:
+                raise
+            print(f"Notion page creation failed ({e}), checking whether it was created anyway...")
+        time.sleep(resilience.backoff_delay(attempt))
+        existing = _call_notion(notion.databases.query, database_id=NOTION_DATABASE_ID,
+                                filter=_page_filter(properties), page_size=1).get("results")
+        if existing:
+            return existing[0]
+
+async def _create_page_async(client: AsyncClient, properties: dict, children: list) -> dict:
+    """_create_page on a shared AsyncClient."""
+    for attempt in range(NOTION_MAX_RETRIES + 1):
+        try:
+            return await _call_notion_async(client.pages.create, retryable=_is_unsent,
+                                            parent={"database_id": NOTION_DATABASE_ID}, properties=properties,
+                                            children=children)
+        except Exception as e:
+            if not _is_retryable(e) or attempt == NOTION_MAX_RETRIES:
+                raise
+            print(f"Notion page creation failed ({e}), checking whether it was created anyway...")
+        await asyncio.sleep(resilience.backoff_delay(attempt))
+        existing = (await _call_notion_async(client.databases.query, database_id=NOTION_DATABASE_ID,
+                                             filter=_page_filter(properties), page_size=1)).get("results")
+        if existing:
+            return existing[0]
+
+def _summary_blocks(summary: str) -> list:
+    """The summary as plain-text paragraph blocks (no markdown).
+
+    Notion has a 2000 character limit per text block, so split into multiple blocks.
+    """
+    summary_text = summary if summary else ""
+
+    # Split summary into chunks of max 1900 characters
+    chunk_size = 1900
+    chunks = [summary_text[i:i+chunk_size] for i in range(0, len(summary_text), chunk_size)]
+
+    children = []
+    for chunk in chunks:
+        children.append({
+            "object": "block",
+            "type": "paragraph",
+            "paragraph": {
+                "rich_text": [
+                    {
+                        "type": "text",
+                        "text": {
+                            "content": chunk
+                        }
+                    }
+                ]
+            }
+        })
+    return children
 
 def add_to_notion_database(seed_paper: str, citing_title: str, summary: str, tldr: str = "", gmail_msg_id: str = "",
                           citing_url: str = "", authors: str = ""):
@@ -16,100 +224,45 @@ def add_to_notion_database(seed_paper: str, citing_title: str, summary: str, tld
     - Gmail Msg ID: Email message ID
     - date_received: When the email was received
     - summary: Full summary (stored as child block content, plain text, ~1200 tokens)
+
+    The page and its summary blocks are created in a single request.
     """
     try:
-        # Truncate fields to Notion's limits
-        page_title = citing_title[:100] if citing_title else ""
-        seed_paper_truncated = seed_paper[:100] if seed_paper else ""
-        tldr_truncated = tldr[:500] if tldr else ""
-
-        properties = {
-            "title": {
-                "title": [
-                    {
-                        "text": {
-                            "content": page_title
-                        }
-                    }
-                ]
-            },
-            "seed_paper": {
-                "rich_text": [
-                    {
-                        "text": {
-                            "content": seed_paper_truncated
-                        }
-                    }
-                ]
-            },
-            "TLDR": {
-                "rich_text": [
-                    {
-                        "text": {
-                            "content": tldr_truncated
-                        }
-                    }
-                ]
-            },
-            "Gmail Msg ID": {
-                "rich_text": [
-                    {
-                        "text": {
-                            "content": gmail_msg_id
-                        }
-                    }
-                ]
-            },
-            "date_received": {
-                "date": {
-                    "start": datetime.now().isoformat()
-                }
-            }
-        }
+        properties = _page_properties(seed_paper, citing_title, tldr, gmail_msg_id, citing_url)
+        children = _summary_blocks(summary)
 
-        # Add URL if provided
-        if citing_url:
-            properties["url"] = {
-                "url": citing_url
-            }
+        # Create the page with the summary inline
+        page = _create_page(properties, children[:_MAX_BLOCKS_PER_REQUEST])
 
-        # Create the main page
-        page = notion.pages.create(
-            parent={"database_id": NOTION_DATABASE_ID},
-            properties=properties
-        )
-
-        page_id = page['id']
-
-        # Add the summary as child block content (plain text, no markdown)
-        # Notion has a 2000 character limit per text block, so split into multiple blocks
-        summary_text = summary if summary else ""
-
-        if summary_text:
-            # Split summary into chunks of max 1900 characters
-            chunk_size = 1900
-            chunks = [summary_text[i:i+chunk_size] for i in range(0, len(summary_text), chunk_size)]
-
-            children = []
-            for chunk in chunks:
-                children.append({
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [
-                            {
-                                "type": "text",
-                                "text": {
-                                    "content": chunk
-                                }
-                            }
-                        ]
-                    }
-                })
+        # Only very long summaries need follow-up requests
+        for start in range(_MAX_BLOCKS_PER_REQUEST, len(children), _MAX_BLOCKS_PER_REQUEST):
+            _call_notion(
+                notion.blocks.children.append,
+                block_id=page['id'],
+                children=children[start:start + _MAX_BLOCKS_PER_REQUEST]
+            )
+
+        print(f"Successfully added to Notion: {citing_title}")
+        return True
+    except Exception as e:
+        print(f"Error adding to Notion: {e}")
+        return False
+
+async def add_to_notion_database_async(client: AsyncClient, seed_paper: str, citing_title: str, summary: str,
+                                       tldr: str = "", gmail_msg_id: str = "", citing_url: str = "",
+                                       authors: str = ""):
+    """add_to_notion_database on a shared AsyncClient."""
+    try:
+        properties = _page_properties(seed_paper, citing_title, tldr, gmail_msg_id, citing_url)
+        children = _summary_blocks(summary)
 
-            notion.blocks.children.append(
-                block_id=page_id,
-                children=children
+        page = await _create_page_async(client, properties, children[:_MAX_BLOCKS_PER_REQUEST])
+
+        for start in range(_MAX_BLOCKS_PER_REQUEST, len(children), _MAX_BLOCKS_PER_REQUEST):
+            await _call_notion_async(
+                client.blocks.children.append,
+                block_id=page['id'],
+                children=children[start:start + _MAX_BLOCKS_PER_REQUEST]
             )
 
         print(f"Successfully added to Notion: {citing_title}")
@@ -117,3 +270,54 @@ def add_to_notion_database(seed_paper: str, citing_title: str, summary: str, tld
     except Exception as e:
         print(f"Error adding to Notion: {e}")
         return False
+
+def add_many_to_notion_database(entries: List[dict], workers: int = None) -> List[bool]:
+    """Bulk mode: write many pages as fast as the rate limit allows.
+
+    `entries` are keyword arguments for add_to_notion_database. Pages are
+    drained from a queue by `workers` threads (default: the Notion stage
+    concurrency), all paced by the shared rate limiter. Returns a success
+    flag per entry, in order.
+    """
+    if not entries:
+        return []
+    workers = workers or STAGE_LIMITS.get("notion", 1)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(entries)))) as executor:
+        return list(executor.map(lambda entry: add_to_notion_database(**entry), entries))
+
+def _plain_text(prop) -> str:
+    """Concatenated plain text of a title / rich_text property value."""
+    if not prop:
+        return ""
+    parts = prop.get(prop.get("type", ""), [])
+    if not isinstance(parts, list):
+        return ""
+    return "".join(part.get("plain_text", "") for part in parts)
+
+def iter_database_entries():
+    """Yield every row of the citation database, following pagination.
+
+    Each entry is a dict with citing_title, seed_paper, url and gmail_msg_id.
+    """
+    start_cursor = None
+    while True:
+        kwargs = {"database_id": NOTION_DATABASE_ID, "page_size": 100}
+        if start_cursor:
+            kwargs["start_cursor"] = start_cursor
+
+        response = _call_notion(notion.databases.query, **kwargs)
+
+        for page in response.get("results", []):
+            properties = page.get("properties", {})
+            # The title property is keyed by its display name (e.g. "Name")
+            title = next((p for p in properties.values() if p.get("type") == "title"), None)
+            yield {
+                "citing_title": _plain_text(title),
+                "seed_paper": _plain_text(properties.get("seed_paper")),
+                "url": (properties.get("url") or {}).get("url") or "",
+                "gmail_msg_id": _plain_text(properties.get("Gmail Msg ID")),
+            }
+
+        if not response.get("has_more"):
+            break
+        start_cursor = response.get("next_cursor")
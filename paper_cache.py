@@ -0,0 +1,121 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from config import PAPER_CACHE_FILE, PAPER_CACHE_TTL, PAPER_CACHE_MAX_BYTES
+from titles import normalize_title
+import metrics
+
+# Entries are keyed by "title:<normalized title>" (resolved arXiv metadata)
+# and "text:<arXiv id>" (extracted PDF text; the PDF's URL stands in for the
+# id of papers not on arXiv). Values are JSON documents.
+_lock = threading.Lock()
+_conn = None
+
+def _connect():
+    global _conn
+    if _conn is None:
+        directory = os.path.dirname(PAPER_CACHE_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _conn = sqlite3.connect(PAPER_CACHE_FILE, check_same_thread=False)
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        _conn.commit()
+    return _conn
+
+def _get(key: str) -> Optional[dict]:
+    value = _lookup(key)
+    # Hit/miss counters per kind of entry, e.g. cache.text.hit
+    metrics.count(f"cache.{key.split(':', 1)[0]}.{'miss' if value is None else 'hit'}")
+    return value
+
+def _lookup(key: str) -> Optional[dict]:
+    now = time.time()
+    try:
+        with _lock:
+            conn = _connect()
+            row = conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if PAPER_CACHE_TTL > 0 and now - created_at > PAPER_CACHE_TTL:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return json.loads(value)
+    except Exception as e:
+        print(f"Error reading paper cache: {e}")
+        return None
+
+def _put(key: str, value: dict):
+    now = time.time()
+    data = json.dumps(value)
+    size = len(data.encode('utf-8'))
+    try:
+        with _lock:
+            conn = _connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, size, now, now)
+            )
+            _evict(conn, now)
+            conn.commit()
+    except Exception as e:
+        print(f"Error writing paper cache: {e}")
+
+def _evict(conn, now: float):
+    """Drop expired entries, then least recently used ones until under the size cap."""
+    if PAPER_CACHE_TTL > 0:
+        conn.execute("DELETE FROM cache WHERE created_at < ?", (now - PAPER_CACHE_TTL,))
+
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+    if PAPER_CACHE_MAX_BYTES <= 0 or total <= PAPER_CACHE_MAX_BYTES:
+        return
+
+    # Evict down to 90% of the cap so we don't evict again on every insert
+    excess = total - int(PAPER_CACHE_MAX_BYTES * 0.9)
+    victims = []
+    for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed_at ASC"):
+        if excess <= 0:
+            break
+        victims.append((key,))
+        excess -= size
+    conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+
+def get_paper_metadata(title: str) -> Optional[dict]:
+    """Return cached arXiv metadata for a title, or None on a miss."""
+    key = normalize_title(title)
+    return _get(f"title:{key}") if key else None
+
+def put_paper_metadata(title: str, metadata: dict):
+    """Cache resolved arXiv metadata (entry_id, pdf_url, authors, abstract) for a title."""
+    key = normalize_title(title)
+    if key:
+        _put(f"title:{key}", metadata)
+
+def get_paper_text(arxiv_id: str) -> Optional[str]:
+    """Return cached extracted text for an arXiv id, or None on a miss."""
+    if not arxiv_id:
+        return None
+    value = _get(f"text:{arxiv_id}")
+    return value.get("text") if value else None
+
+def put_paper_text(arxiv_id: str, text: str):
+    """Cache extracted PDF text for an arXiv id."""
+    if arxiv_id and text:
+        _put(f"text:{arxiv_id}", {"text": text})
@@ -1,12 +1,132 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+import httpx
 import requests
 import arxiv
-from typing import Optional, Tuple
+from itertools import islice
+from urllib.parse import urlsplit
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+from concurrency import stage_slot, stage_slot_async
+from config import (ARXIV_API_URL, ARXIV_BATCH_SIZE, ARXIV_MATCH_THRESHOLD, PDF_MAX_BYTES, PDF_MAX_PAGES, PDF_MAX_CHARS, PDF_TIMEOUT,
+                    PDF_PARSE_WORKERS, PDF_PARSE_GRACE)
+from titles import normalize_title, title_similarity
+import paper_cache
+import metrics
+import resilience
 
-def search_paper_content(title: str) -> Tuple[Optional[str], str, str]:
-    """Search for paper content using arXiv API. Returns (content, url, authors)."""
+# Shared client: arxiv.Client enforces its delay between requests per
+# instance, so rate limiting only works if every lookup goes through one.
+# Retries are left to resilience.call rather than the client's own loop.
+_arxiv_client = arxiv.Client(num_retries=0)
+_arxiv_client.query_url_format = ARXIV_API_URL + "?{}"
+
+@dataclass
+class PaperInfo:
+    """Result of resolving a title on arXiv. Full text is fetched lazily."""
+    title: str
+    entry_id: str
+    pdf_url: str
+    abstract: str
+    authors: str
+    # arXiv PDF of the same paper, tried when pdf_url (a direct link from the
+    # alert) yields no text
+    fallback_pdf_url: str = ""
+    _text: Optional[str] = field(default=None, repr=False)
+    _text_loaded: bool = field(default=False, repr=False)
+
+    @property
+    def arxiv_id(self) -> str:
+        """Short arXiv id (e.g. 2401.01234v2) from the entry URL, "" for papers not on arXiv."""
+        return arxiv_id_from_url(self.entry_id, keep_version=True)
+
+    def full_text(self) -> Optional[str]:
+        """Return the extracted PDF text, downloading it on first use."""
+        if not self._text_loaded:
+            self._text = _load_full_text(self)
+            self._text_loaded = True
+        return self._text
+
+    async def full_text_async(self, http: httpx.AsyncClient) -> Optional[str]:
+        """full_text() for the async engine, downloading over a shared client."""
+        if not self._text_loaded:
+            self._text = await _load_full_text_async(self, http)
+            self._text_loaded = True
+        return self._text
+
+    def to_metadata(self) -> dict:
+        return {
+            "entry_id": self.entry_id,
+            "pdf_url": self.pdf_url,
+            "authors": self.authors,
+            "abstract": self.abstract,
+            "fallback_pdf_url": self.fallback_pdf_url,
+        }
+
+def _pdf_urls(paper: PaperInfo) -> List[str]:
+    """The PDFs to try for a paper's text, in order."""
+    return [url for url in (paper.pdf_url, paper.fallback_pdf_url) if url]
+
+def _text_key(pdf_url: str) -> str:
+    """Paper-cache key for a PDF's text: its arXiv id, or the URL itself for other hosts."""
+    return arxiv_id_from_url(pdf_url, keep_version=True) or pdf_url
+
+def _load_full_text(paper: PaperInfo) -> Optional[str]:
+    for index, pdf_url in enumerate(_pdf_urls(paper)):
+        if index:
+            print(f"No text from {paper.pdf_url}, trying the arXiv version: {pdf_url}")
+        content = paper_cache.get_paper_text(_text_key(pdf_url))
+        if content is None:
+            content = fetch_paper_text(pdf_url)
+            if content:
+                paper_cache.put_paper_text(_text_key(pdf_url), content)
+        if content:
+            return content
+    return None
+
+def _is_retryable(error) -> bool:
+    # arXiv's API is known to return spurious empty pages under load
+    return isinstance(error, arxiv.UnexpectedEmptyPageError) or resilience.is_transient(error)
+
+def _arxiv_results(search: arxiv.Search, stage: str, paper: Optional[str] = None,
+                   limit: Optional[int] = None) -> List[arxiv.Result]:
+    """Run an arXiv query as one metrics span, retrying transient failures."""
+    def attempt():
+        with stage_slot("arxiv"):
+            return list(islice(_arxiv_client.results(search), limit))
+
+    with metrics.span(stage, paper=paper) as span:
+        return resilience.call("arxiv", attempt, retryable=_is_retryable, span=span)
+
+async def _load_full_text_async(paper: PaperInfo, http: httpx.AsyncClient) -> Optional[str]:
+    for index, pdf_url in enumerate(_pdf_urls(paper)):
+        if index:
+            print(f"No text from {paper.pdf_url}, trying the arXiv version: {pdf_url}")
+        content = paper_cache.get_paper_text(_text_key(pdf_url))
+        if content is None:
+            content = await fetch_paper_text_async(http, pdf_url)
+            if content:
+                paper_cache.put_paper_text(_text_key(pdf_url), content)
+        if content:
+            return content
+    return None
+
+def lookup_paper(title: str) -> Optional[PaperInfo]:
+    """Resolve a title on arXiv with a single query (cached on disk).
+
+    Returns None if no match was found or the lookup failed.
+    """
     try:
-        # Search arXiv
-        client = arxiv.Client()
+        metadata = paper_cache.get_paper_metadata(title)
+        if metadata is not None:
+            return PaperInfo(title=title, **metadata)
+
         search = arxiv.Search(
             query=f'ti:"{title}"',
             max_results=1,
@@ -14,64 +134,510 @@ def search_paper_content(title: str) -> Tuple[Optional[str], str, str]:
             sort_order=arxiv.SortOrder.Descending
         )
 
-        for result in search.results():
-            # Get the PDF URL and metadata
-            pdf_url = result.pdf_url
-            paper_url = result.entry_id
-            authors = ", ".join([author.name for author in result.authors])
+        results = _arxiv_results(search, "arxiv.search", limit=1)
+        if not results:
+            return None
+
+        paper = _paper_from_result(title, results[0])
+        paper_cache.put_paper_metadata(title, paper.to_metadata())
+        return paper
+    except Exception as e:
+        print(f"Error searching arXiv: {e}")
+        return None
 
-            if pdf_url:
-                content = fetch_paper_text(pdf_url)
-                return content, paper_url, authors
+def _paper_from_result(title: str, result: arxiv.Result) -> PaperInfo:
+    return PaperInfo(
+        title=title,
+        entry_id=result.entry_id,
+        pdf_url=result.pdf_url or "",
+        abstract=result.summary or "",
+        authors=", ".join([author.name for author in result.authors]),
+    )
 
-            return None, paper_url, authors
+def _title_query(title: str) -> str:
+    # Quotes would terminate the phrase early, so drop them from the title
+    return 'ti:"{}"'.format(title.replace('"', ' '))
 
-        return None, "", ""
+def resolve_titles(titles: List[str]) -> Dict[str, Optional[PaperInfo]]:
+    """Resolve many titles on arXiv with a few OR-combined queries.
+
+    Titles already in the cache cost nothing; the rest are sent in chunks of
+    ARXIV_BATCH_SIZE and matched back to the input titles by fuzzy title
+    similarity. Returns {title: PaperInfo or None} for every input title.
+    """
+    resolved = {}
+    pending = []
+    seen = set()
+    for title in titles:
+        key = normalize_title(title)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+
+        metadata = paper_cache.get_paper_metadata(title)
+        if metadata is not None:
+            resolved[title] = PaperInfo(title=title, **metadata)
+        else:
+            pending.append(title)
+
+    batch_size = max(1, ARXIV_BATCH_SIZE)
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        resolved.update(_resolve_title_chunk(chunk))
+
+    # Duplicate spellings of the same title share the first one's result
+    by_key = {normalize_title(title): paper for title, paper in resolved.items()}
+    return {title: by_key.get(normalize_title(title)) for title in titles}
+
+def _resolve_title_chunk(chunk: List[str]) -> Dict[str, Optional[PaperInfo]]:
+    max_results = len(chunk) * 3
+    search = arxiv.Search(
+        query=" OR ".join(_title_query(title) for title in chunk),
+        max_results=max_results,
+    )
+
+    try:
+        results = _arxiv_results(search, "arxiv.search_batch", paper="")
     except Exception as e:
-        print(f"Error searching arXiv: {e}")
+        print(f"Error in batched arXiv search: {e}")
+        return {title: lookup_paper(title) for title in chunk}
+
+    resolved = {}
+    for title in chunk:
+        best, best_score = None, 0.0
+        for result in results:
+            score = title_similarity(title, result.title)
+            if score > best_score:
+                best, best_score = result, score
+
+        if best is not None and best_score >= ARXIV_MATCH_THRESHOLD:
+            paper = _paper_from_result(title, best)
+            paper_cache.put_paper_metadata(title, paper.to_metadata())
+            resolved[title] = paper
+        elif len(results) >= max_results:
+            # The result page was full, so the match may have been cut off
+            resolved[title] = lookup_paper(title)
+        else:
+            resolved[title] = None
+    return resolved
+
+def resolve_arxiv_ids(arxiv_ids: List[str]) -> Dict[str, PaperInfo]:
+    """Fetch metadata for known arXiv ids with batched id_list queries.
+
+    Returns {arxiv_id: PaperInfo} for the ids arXiv knows about.
+    """
+    resolved = {}
+    ids = list(dict.fromkeys(i for i in arxiv_ids if i))
+    batch_size = max(1, ARXIV_BATCH_SIZE)
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        search = arxiv.Search(id_list=chunk, max_results=len(chunk))
+        try:
+            results = _arxiv_results(search, "arxiv.id_list", paper="")
+        except Exception as e:
+            print(f"Error in arXiv id_list lookup: {e}")
+            continue
+
+        # Match by id rather than position; requested ids may omit the version
+        by_id = {}
+        for result in results:
+            short_id = result.get_short_id()
+            by_id[short_id] = result
+            by_id.setdefault(_strip_version(short_id), result)
+        for arxiv_id in chunk:
+            result = by_id.get(arxiv_id)
+            if result is not None:
+                resolved[arxiv_id] = _paper_from_result(result.title, result)
+    return resolved
+
+def paper_from_pdf_link(title: str, pdf_url: str, authors: str = "",
+                        arxiv_match: Optional[PaperInfo] = None) -> PaperInfo:
+    """A paper with a direct PDF link; its text is fetched from that link.
+
+    If the title also matched an arXiv paper, its abstract is kept and its
+    PDF is the fallback for when the link yields no text (paywalled, HTML,
+    unparseable).
+    """
+    return PaperInfo(title=title, entry_id=pdf_url, pdf_url=pdf_url, authors=authors,
+                     abstract=arxiv_match.abstract if arxiv_match else "",
+                     fallback_pdf_url=arxiv_match.pdf_url if arxiv_match else "")
+
+def resolve_alert_papers(papers: list) -> List[Optional[PaperInfo]]:
+    """Resolve citing papers from Scholar alerts, using their links where possible.
+
+    `papers` are alert_parser.AlertPaper entries. arXiv links are resolved by
+    id in batched id_list queries and the rest are searched by title. Other
+    direct PDF links are used as they are, with the arXiv match of their
+    title (if any) as a fallback. Returns a PaperInfo (or None) per input
+    paper, in order.
+    """
+    resolved = [None] * len(papers)
+    by_arxiv_id = {}
+    by_title = []
+    for index, paper in enumerate(papers):
+        arxiv_id = arxiv_id_from_url(paper.url, keep_version=True)
+        if arxiv_id:
+            by_arxiv_id.setdefault(arxiv_id, []).append(index)
+        else:
+            by_title.append(index)
+
+    found = resolve_arxiv_ids(list(by_arxiv_id))
+    for arxiv_id, indices in by_arxiv_id.items():
+        for index in indices:
+            title = papers[index].title
+            info = found.get(arxiv_id)
+            if info is None:
+                # Unknown to the API (e.g. brand new): the link itself is still good
+                resolved[index] = PaperInfo(
+                    title=title,
+                    entry_id=f"http://arxiv.org/abs/{arxiv_id}",
+                    pdf_url=f"https://arxiv.org/pdf/{arxiv_id}",
+                    abstract="",
+                    authors=papers[index].authors,
+                )
+            else:
+                resolved[index] = replace(info, title=title)
+                paper_cache.put_paper_metadata(title, info.to_metadata())
+
+    if by_title:
+        by_title_result = resolve_titles([papers[index].title for index in by_title])
+        for index in by_title:
+            paper = papers[index]
+            match = by_title_result.get(paper.title)
+            if paper.has_pdf and paper.url:
+                resolved[index] = paper_from_pdf_link(paper.title, paper.url, paper.authors, match)
+            else:
+                resolved[index] = match
+    return resolved
+
+def _strip_version(arxiv_id: str) -> str:
+    base, sep, version = arxiv_id.rpartition('v')
+    return base if sep and version.isdigit() and base else arxiv_id
+
+# New-style (2401.01234) and old-style (hep-th/9901001) ids, optional version
+_ARXIV_URL = re.compile(
+    r'arxiv\.org/(?:abs|pdf)/((?:\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(?:v\d+)?)',
+    re.IGNORECASE
+)
+
+def arxiv_id_from_url(url: str, keep_version: bool = False) -> str:
+    """Extract the arXiv id from an arxiv.org abs/pdf URL ("" if it isn't one)."""
+    match = _ARXIV_URL.search(url or "")
+    if not match:
+        return ""
+    return match.group(1) if keep_version else _strip_version(match.group(1))
+
+def search_paper_content(title: str) -> Tuple[Optional[str], str, str]:
+    """Search for paper content using arXiv API. Returns (content, url, authors)."""
+    paper = lookup_paper(title)
+    if paper is None:
         return None, "", ""
+    return paper.full_text(), paper.entry_id, paper.authors
 
 def fetch_paper_text(pdf_url: str) -> Optional[str]:
-    """Fetch and extract text from PDF."""
+    """Fetch and extract text from PDF.
+
+    The PDF is streamed to a temporary file (never held in memory) and pages
+    are extracted one at a time, stopping at PDF_MAX_PAGES / PDF_MAX_CHARS or
+    when the PDF_TIMEOUT wall-clock budget for the document runs out. With
+    PDF_PARSE_WORKERS > 0, extraction runs in a separate process.
+    """
+    pdf_path = None
     try:
-        import PyPDF2
-        import io
+        deadline = time.monotonic() + PDF_TIMEOUT
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
+            pdf_path = pdf_file.name
+            if not _download_pdf(pdf_url, pdf_file, deadline):
+                return None
 
-        response = requests.get(pdf_url, timeout=30)
-        response.raise_for_status()
+        return extract_pdf_file(pdf_path, max(0.0, deadline - time.monotonic()))
+    except Exception as e:
+        print(f"Error fetching paper text: {e}")
+        return None
+    finally:
+        if pdf_path:
+            try:
+                os.remove(pdf_path)
+            except OSError:
+                pass
 
-        pdf_file = io.BytesIO(response.content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
+async def fetch_paper_text_async(http: httpx.AsyncClient, pdf_url: str) -> Optional[str]:
+    """fetch_paper_text over a shared httpx.AsyncClient.
 
-        text = ""
-        # Extract text from first 10 pages (to avoid token limits)
-        for page_num in range(min(10, len(pdf_reader.pages))):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text()
+    Text extraction runs in a thread (or the worker pool) so it doesn't
+    block the event loop.
+    """
+    pdf_path = None
+    try:
+        deadline = time.monotonic() + PDF_TIMEOUT
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
+            pdf_path = pdf_file.name
+            if not await _download_pdf_async(http, pdf_url, pdf_file, deadline):
+                return None
 
-        return text if text.strip() else None
+        return await asyncio.to_thread(extract_pdf_file, pdf_path, max(0.0, deadline - time.monotonic()))
     except Exception as e:
         print(f"Error fetching paper text: {e}")
         return None
+    finally:
+        if pdf_path:
+            try:
+                os.remove(pdf_path)
+            except OSError:
+                pass
+
+def extract_pdf_file(pdf_path: str, time_budget: float) -> Optional[str]:
+    """Extract a downloaded PDF's text as one span, in the worker pool if PDF_PARSE_WORKERS > 0.
+
+    Returns None if no text could be extracted.
+    """
+    with metrics.span("pdf.parse") as span:
+        span.bytes = os.path.getsize(pdf_path)
+        if PDF_PARSE_WORKERS > 0:
+            text = _extract_in_pool(pdf_path, time_budget)
+        else:
+            text = _extract_pdf_path(pdf_path, time_budget)
+    return text if text and text.strip() else None
+
+def _download_pdf(pdf_url: str, pdf_file, deadline: float) -> bool:
+    """Stream a PDF into `pdf_file`, retrying transient failures.
+
+    Returns False if it exceeds the byte or time budget.
+    """
+    def attempt():
+        # A retry starts the file over
+        pdf_file.seek(0)
+        pdf_file.truncate()
+        with stage_slot("pdf"):
+            return _stream_pdf(pdf_url, pdf_file, deadline, span)
+
+    with metrics.span("pdf.download") as span:
+        # One circuit breaker per host, so a failing mirror doesn't block other links
+        endpoint = "pdf:" + urlsplit(pdf_url).netloc
+        return resilience.call(endpoint, attempt, deadline=deadline, span=span)
+
+def _stream_pdf(pdf_url: str, pdf_file, deadline: float, span) -> bool:
+    with requests.get(pdf_url, timeout=30, stream=True) as response:
+        response.raise_for_status()
+
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > PDF_MAX_BYTES:
+            print(f"Skipping PDF larger than {PDF_MAX_BYTES} bytes: {pdf_url}")
+            return False
+
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            # A truncated PDF can't be parsed (the xref table is at the end),
+            # so give up entirely rather than keep a partial file
+            if size > PDF_MAX_BYTES:
+                print(f"Skipping PDF larger than {PDF_MAX_BYTES} bytes: {pdf_url}")
+                return False
+            if time.monotonic() > deadline:
+                print(f"Timed out downloading PDF: {pdf_url}")
+                return False
+            pdf_file.write(chunk)
+            span.bytes = size
+    return True
+
+async def _download_pdf_async(http: httpx.AsyncClient, pdf_url: str, pdf_file, deadline: float) -> bool:
+    """_download_pdf over a shared httpx.AsyncClient."""
+    async def attempt():
+        pdf_file.seek(0)
+        pdf_file.truncate()
+        async with stage_slot_async("pdf"):
+            async with http.stream("GET", pdf_url) as response:
+                response.raise_for_status()
+
+                content_length = response.headers.get('Content-Length')
+                if content_length and content_length.isdigit() and int(content_length) > PDF_MAX_BYTES:
+                    print(f"Skipping PDF larger than {PDF_MAX_BYTES} bytes: {pdf_url}")
+                    return False
+
+                size = 0
+                async for chunk in response.aiter_bytes(64 * 1024):
+                    size += len(chunk)
+                    if size > PDF_MAX_BYTES:
+                        print(f"Skipping PDF larger than {PDF_MAX_BYTES} bytes: {pdf_url}")
+                        return False
+                    if time.monotonic() > deadline:
+                        print(f"Timed out downloading PDF: {pdf_url}")
+                        return False
+                    pdf_file.write(chunk)
+                    span.bytes = size
+        return True
+
+    with metrics.span("pdf.download") as span:
+        endpoint = "pdf:" + urlsplit(pdf_url).netloc
+        return await resilience.call_async(endpoint, attempt, deadline=deadline, span=span)
+
+def _extract_pdf_path(pdf_path: str, time_budget: float) -> str:
+    """Extract text from a PDF on disk. Top-level so it can run in a worker process."""
+    deadline = time.monotonic() + time_budget
+    with open(pdf_path, 'rb') as pdf_file:
+        return _extract_pdf_text(pdf_file, deadline)
+
+def _extract_pdf_text(pdf_file, deadline: float) -> str:
+    """Extract text page by page until the page, character or time budget is hit."""
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(pdf_file)
+
+    parts = []
+    total_chars = 0
+    for page_num, page in enumerate(pdf_reader.pages):
+        if page_num >= PDF_MAX_PAGES or total_chars >= PDF_MAX_CHARS:
+            break
+        if time.monotonic() > deadline:
+            print(f"PDF extraction time budget reached after {page_num} pages")
+            break
+
+        page_text = page.extract_text() or ""
+        parts.append(page_text)
+        total_chars += len(page_text)
+
+    return "".join(parts)[:PDF_MAX_CHARS]
 
 def search_paper_abstract(title: str) -> Tuple[Optional[str], str, str]:
     """Fallback: search for paper abstract using arXiv API. Returns (abstract, url, authors)."""
+    paper = lookup_paper(title)
+    if paper is None:
+        return None, "", ""
+    return paper.abstract or None, paper.entry_id, paper.authors
+
+def _parse_worker_main(conn):
+    """Parse-worker process: extract each (pdf_path, time_budget) sent over `conn` and send back the result."""
+    conn.send(True)  # started
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        try:
+            conn.send((True, _extract_pdf_path(*request)))
+        except Exception as e:
+            try:
+                conn.send((False, e))
+            except Exception:
+                # The exception itself can't be pickled
+                conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+class _WorkerTimeout(Exception):
+    pass
+
+class _WorkerDied(Exception):
+    pass
+
+class _ParseWorker:
+    """A worker process that parses one PDF at a time, and can be killed mid-parse."""
+
+    def __init__(self):
+        # spawn (not fork): the parent is multi-threaded, and it is the only
+        # start method available on Windows anyway
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_parse_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # Wait for startup here, so it doesn't count against a document's budget
+        self._conn.recv()
+
+    def parse(self, pdf_path: str, time_budget: float, timeout: float) -> str:
+        """Extract a PDF's text in the worker.
+
+        Raises _WorkerTimeout if no result arrives within `timeout` seconds,
+        _WorkerDied if the worker process is gone, and whatever the parse
+        itself raised.
+        """
+        try:
+            self._conn.send((pdf_path, time_budget))
+            if not self._conn.poll(timeout):
+                raise _WorkerTimeout()
+            ok, result = self._conn.recv()
+        except (EOFError, OSError) as e:
+            raise _WorkerDied() from e
+        if not ok:
+            raise result
+        return result
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self._conn.close()
+
+    def stop(self):
+        try:
+            self._conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self._conn.close()
+
+# Each parse worker is its own process, so a worker stuck on a pathological
+# PDF can be killed without touching the other documents' parses
+_idle_workers: "queue.Queue[_ParseWorker]" = queue.Queue()
+_workers = set()
+_workers_lock = threading.Lock()
+# At most PDF_PARSE_WORKERS documents are parsed at once, so a parse never
+# waits behind another one in a worker
+_parse_slots = threading.BoundedSemaphore(max(1, PDF_PARSE_WORKERS))
+
+def _checkout_worker() -> _ParseWorker:
     try:
-        client = arxiv.Client()
-        search = arxiv.Search(
-            query=f'ti:"{title}"',
-            max_results=1,
-            sort_by=arxiv.SortCriterion.SubmittedDate,
-            sort_order=arxiv.SortOrder.Descending
-        )
+        return _idle_workers.get_nowait()
+    except queue.Empty:
+        pass
+    worker = _ParseWorker()
+    with _workers_lock:
+        _workers.add(worker)
+    return worker
 
-        for result in search.results():
-            paper_url = result.entry_id
-            authors = ", ".join([author.name for author in result.authors])
-            return result.summary, paper_url, authors
+def _discard_worker(worker: _ParseWorker):
+    """Kill a worker that is stuck or died."""
+    with _workers_lock:
+        _workers.discard(worker)
+    worker.kill()
 
-        return None, "", ""
-    except Exception as e:
-        print(f"Error searching paper abstract: {e}")
-        return None, "", ""
+def _extract_in_pool(pdf_path: str, time_budget: float) -> Optional[str]:
+    with _parse_slots:
+        # The budget starts once a worker is free, not while waiting for one
+        deadline = time.monotonic() + time_budget
+        for attempt in range(2):
+            worker = _checkout_worker()
+            remaining = max(0.0, deadline - time.monotonic())
+            try:
+                text = worker.parse(pdf_path, remaining, timeout=remaining + PDF_PARSE_GRACE)
+            except _WorkerTimeout:
+                print(f"PDF parsing timed out, killing worker: {pdf_path}")
+                _discard_worker(worker)
+                return None
+            except _WorkerDied:
+                # The worker process died; retry once on a new one with what is left of the budget
+                _discard_worker(worker)
+                if attempt:
+                    raise
+                if time.monotonic() >= deadline:
+                    return None
+                continue
+            except Exception:
+                # The document failed to parse; the worker itself is fine
+                _idle_workers.put(worker)
+                raise
+            _idle_workers.put(worker)
+            return text
+    return None
 
+def shutdown_parse_pool():
+    """Stop the PDF parsing worker processes, if any were started."""
+    with _workers_lock:
+        workers = list(_workers)
+        _workers.clear()
+    while not _idle_workers.empty():
+        _idle_workers.get_nowait()
+    for worker in workers:
+        worker.stop()
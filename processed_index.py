@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Local index of citing papers already written to Notion.
+
+Rows are keyed by (citing title, seed paper), both normalized, and also
+carry the arXiv id and Gmail message id. main.py checks the index before
+fetching or summarizing, so a rerun after a crash skips papers that already
+made it into Notion.
+
+Rebuild the index from the Notion database with:
+    python processed_index.py --rebuild
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from config import PROCESSED_INDEX_FILE
+from titles import normalize_title
+
+# Notion stores titles cut to 100 characters, so keys are built from the
+# same prefix to match rows rebuilt from the database
+_NOTION_TITLE_LIMIT = 100
+
+_lock = threading.Lock()
+_conn = None
+
+def _key(title: str) -> str:
+    return normalize_title((title or "")[:_NOTION_TITLE_LIMIT])
+
+def _connect(rebuild_if_new: bool = True):
+    global _conn
+    if _conn is None:
+        directory = os.path.dirname(PROCESSED_INDEX_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _conn = sqlite3.connect(PROCESSED_INDEX_FILE, check_same_thread=False)
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS processed (
+                title_key TEXT NOT NULL,
+                seed_key TEXT NOT NULL,
+                arxiv_id TEXT NOT NULL DEFAULT '',
+                gmail_msg_id TEXT NOT NULL DEFAULT '',
+                created_at REAL NOT NULL,
+                PRIMARY KEY (title_key, seed_key)
+            )"""
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS processed_arxiv_id ON processed (arxiv_id, seed_key)")
+        _conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        _conn.commit()
+
+        rebuilt = _conn.execute("SELECT 1 FROM meta WHERE key = 'rebuilt_at'").fetchone()
+        if rebuilt is None and rebuild_if_new:
+            # First run on this machine (or an earlier rebuild failed): seed the
+            # index from what's already in Notion
+            _rebuild(_conn)
+    return _conn
+
+def is_processed(citing_title: str, seed_paper: str, arxiv_id: str = "") -> bool:
+    """True if this citing paper was already written to Notion for this seed paper."""
+    seed_key = _key(seed_paper)
+    try:
+        with _lock:
+            conn = _connect()
+            row = conn.execute(
+                "SELECT 1 FROM processed WHERE title_key = ? AND seed_key = ?",
+                (_key(citing_title), seed_key)
+            ).fetchone()
+            if row is None and arxiv_id:
+                row = conn.execute(
+                    "SELECT 1 FROM processed WHERE arxiv_id = ? AND seed_key = ?",
+                    (arxiv_id, seed_key)
+                ).fetchone()
+        return row is not None
+    except Exception as e:
+        print(f"Error reading processed index: {e}")
+        return False
+
+def mark_processed(citing_title: str, seed_paper: str, arxiv_id: str = "", gmail_msg_id: str = ""):
+    """Record that a citing paper was written to Notion for a seed paper."""
+    try:
+        with _lock:
+            conn = _connect()
+            _insert(conn, citing_title, seed_paper, arxiv_id, gmail_msg_id)
+            conn.commit()
+    except Exception as e:
+        print(f"Error writing processed index: {e}")
+
+def _insert(conn, citing_title, seed_paper, arxiv_id, gmail_msg_id):
+    conn.execute(
+        "INSERT OR REPLACE INTO processed (title_key, seed_key, arxiv_id, gmail_msg_id, created_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (_key(citing_title), _key(seed_paper), arxiv_id or "", gmail_msg_id or "", time.time())
+    )
+
+def _rebuild(conn) -> int:
+    from notion_handler import iter_database_entries
+    from paper_fetcher import arxiv_id_from_url
+
+    print("Rebuilding processed-paper index from Notion...")
+    count = 0
+    try:
+        for entry in iter_database_entries():
+            if not entry["citing_title"]:
+                continue
+            _insert(conn, entry["citing_title"], entry["seed_paper"],
+                    arxiv_id_from_url(entry["url"]), entry["gmail_msg_id"])
+            count += 1
+        # Only a complete rebuild is marked, so a failed one is retried on the next start
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rebuilt_at', ?)", (str(time.time()),))
+        conn.commit()
+        print(f"[OK] Indexed {count} existing Notion entries")
+    except Exception as e:
+        conn.rollback()
+        print(f"Error rebuilding processed index from Notion: {e}")
+    return count
+
+def rebuild_from_notion() -> int:
+    """Replace the index with the contents of the Notion database. Returns rows indexed."""
+    with _lock:
+        conn = _connect(rebuild_if_new=False)
+        conn.execute("DELETE FROM processed")
+        return _rebuild(conn)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Processed-paper index")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index from the Notion database")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild_from_notion()
+    else:
+        with _lock:
+            total = _connect().execute("SELECT COUNT(*) FROM processed").fetchone()[0]
+        print(f"{total} papers in {PROCESSED_INDEX_FILE}")
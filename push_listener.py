@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Event-driven mode: process new Scholar alerts as soon as Gmail reports them.
+
+Gmail publishes mailbox changes to a Pub/Sub topic (users.watch), and a push
+subscription POSTs each notification to this listener. Every notification
+wakes a single worker thread that runs one processing cycle; notifications
+arriving mid-cycle are coalesced into one follow-up cycle. The worker also
+runs every POLL_INTERVAL seconds, so a missed notification is only delayed,
+never lost, and renews the Gmail watch before it expires.
+
+Run it through main.py with GMAIL_PUSH_TOPIC set, or directly:
+    python push_listener.py [--no-watch]
+Send fake notifications locally with stubs/fake_pubsub.py.
+"""
+
+import argparse
+import base64
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from config import GMAIL_PUSH_TOPIC, PUSH_HOST, PUSH_PORT, PUSH_TOKEN, POLL_INTERVAL, GMAIL_WATCH_RENEW
+
+# Pub/Sub push bodies are a few hundred bytes; anything much larger isn't one
+MAX_BODY_BYTES = 64 * 1024
+
+def parse_push_message(body: dict) -> dict:
+    """Decode the Gmail notification ({"emailAddress", "historyId"}) inside a Pub/Sub push body."""
+    data = body["message"]["data"]
+    return json.loads(base64.b64decode(data).decode("utf-8"))
+
+def make_handler(on_notification, token=""):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, close=False):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            if close:
+                # The request body was left unread, so the connection can't be reused
+                self.send_header("Connection", "close")
+                self.close_connection = True
+            self.end_headers()
+
+        def do_GET(self):
+            # Health check
+            self._send(200)
+
+        def do_POST(self):
+            # Authenticate before reading anything from the client, in constant time
+            provided = parse_qs(urlsplit(self.path).query).get("token", [""])[0]
+            if token and not hmac.compare_digest(provided.encode("utf-8"), token.encode("utf-8")):
+                return self._send(403, close=True)
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                return self._send(400, close=True)
+            if length < 0 or length > MAX_BODY_BYTES:
+                return self._send(413, close=True)
+            raw = self.rfile.read(length)
+
+            try:
+                notification = parse_push_message(json.loads(raw or b"{}"))
+            except (KeyError, ValueError) as e:
+                print(f"Ignoring malformed push message: {e}")
+                return self._send(400)
+
+            # Acknowledge right away; the work happens on the worker thread
+            on_notification(notification)
+            self._send(204)
+
+    return Handler
+
+def start_server(on_notification, host=PUSH_HOST, port=PUSH_PORT, token=PUSH_TOKEN):
+    """Start the push endpoint in a background thread. Returns the server."""
+    server = ThreadingHTTPServer((host, port), make_handler(on_notification, token))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _renew_watch(topic):
+    from gmail_handler import watch_mailbox
+    try:
+        watch_mailbox(topic)
+        return True
+    except Exception as e:
+        print(f"Error renewing Gmail watch: {e}")
+        return False
+
+def run(process, topic=GMAIL_PUSH_TOPIC, poll_interval=POLL_INTERVAL, watch=True):
+    """Serve push notifications and run `process` once per wake-up. Never returns.
+
+    Refuses to start without PUSH_TOKEN: the endpoint is reachable from the
+    network, and every accepted request triggers a processing cycle.
+    """
+    if not PUSH_TOKEN:
+        raise ValueError("PUSH_TOKEN must be set to serve push notifications "
+                         "(the push subscription's endpoint URL must end in ?token=<PUSH_TOKEN>)")
+    wake = threading.Event()
+
+    def on_notification(notification):
+        print(f"Gmail notification for {notification.get('emailAddress')} "
+              f"(history id {notification.get('historyId')})")
+        wake.set()
+
+    server = start_server(on_notification)
+    print(f"Listening for Gmail push notifications on http://{PUSH_HOST}:{server.server_address[1]}")
+
+    # A failed renewal is retried on the next wake-up rather than a day later
+    watch_renewed_at = None
+    try:
+        while True:
+            if watch and topic and (watch_renewed_at is None
+                                    or time.monotonic() - watch_renewed_at >= GMAIL_WATCH_RENEW):
+                if _renew_watch(topic):
+                    watch_renewed_at = time.monotonic()
+
+            try:
+                process()
+            except Exception as e:
+                print(f"Error processing emails: {e}")
+
+            # Sleep until the next notification, or poll as a fallback
+            if not wake.wait(timeout=poll_interval):
+                print("No push notification received, polling")
+            wake.clear()
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gmail push notification listener")
+    parser.add_argument("--no-watch", action="store_true",
+                        help="don't call Gmail users.watch (e.g. when testing with stubs/fake_pubsub.py)")
+    args = parser.parse_args()
+
+    from main import process_scholar_emails
+    try:
+        run(process_scholar_emails, watch=not args.no_watch)
+    except KeyboardInterrupt:
+        print("Shutting down...")
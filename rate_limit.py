@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+
+class TokenBucket:
+    """Thread-safe token bucket: on average `rate` acquisitions per second,
+    with bursts of up to `capacity`.
+
+    pause() holds every caller back for a while, e.g. to honor a server's
+    Retry-After header for the whole process rather than one request.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available, then take them."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        """acquire() for coroutines: waits without blocking the event loop."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take `tokens` if available and return 0, else return the seconds to wait."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` and drain the burst allowance."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until
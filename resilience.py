@@ -0,0 +1,286 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+import httpx
+import requests
+import metrics
+from config import (RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_BUDGET_RATIO, RETRY_BUDGET_BURST,
+                    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+
+# Statuses worth retrying: timeouts, rate limits and server-side failures
+# (529 is Anthropic's "overloaded")
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504, 529}
+
+# Network-level failures from the HTTP libraries the clients sit on
+_TRANSIENT_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    httpx.TransportError,
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,  # connection dropped mid-download
+)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"{endpoint} is failing, skipping calls for another {retry_in:.0f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """Fail fast after `threshold` consecutive failures.
+
+    While open, calls are refused for `reset_timeout` seconds; after that a
+    single trial call is let through (half-open), and its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, name: str, threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Optional[bool]:
+        """Whether a call may go ahead now: None if not, True if it is the half-open trial, else False.
+
+        A trial must end in record_success(), record_failure() or release().
+        """
+        if self.threshold <= 0:
+            return False
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_timeout:
+                return None
+            self._trial_running = True
+            return True
+
+    def retry_in(self) -> float:
+        """Seconds until the next trial call is allowed (0 when closed)."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"{self.name} recovered, closing its circuit breaker")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def release(self):
+        """End a trial call that told nothing about the endpoint's health, leaving the circuit open."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            trial_failed = self._trial_running
+            self._trial_running = False
+            if not trial_failed and (self._opened_at is not None or self._failures < self.threshold):
+                return
+            self._opened_at = time.monotonic()
+        print(f"{self.name} failed {self._failures} times in a row, "
+              f"pausing its calls for {self.reset_timeout:.0f}s")
+        metrics.count(f"circuit.{self.name}.opened")
+
+class RetryBudget:
+    """Caps retries at a fraction of calls, so retries can't multiply an outage.
+
+    Every call deposits `ratio` tokens and every retry withdraws one; the
+    balance starts at (and never exceeds) `burst`.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, burst: float = RETRY_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._balance = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(self.burst, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take one retry from the budget. False if it is used up."""
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_budgets: Dict[str, RetryBudget] = {}
+_registry_lock = threading.Lock()
+
+def breaker(endpoint: str) -> CircuitBreaker:
+    """The circuit breaker shared by every call to `endpoint`."""
+    with _registry_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+        return _breakers[endpoint]
+
+def budget(endpoint: str) -> RetryBudget:
+    """The retry budget shared by every call to `endpoint`."""
+    with _registry_lock:
+        if endpoint not in _budgets:
+            _budgets[endpoint] = RetryBudget()
+        return _budgets[endpoint]
+
+def status_code(error) -> Optional[int]:
+    """The HTTP status behind an exception from any of the API clients, if there is one."""
+    # anthropic/httpx/requests (status_code), notion/arxiv (status),
+    # googleapiclient (resp.status), requests/httpx (response.status_code)
+    for source in (error, getattr(error, "response", None), getattr(error, "resp", None)):
+        for name in ("status_code", "status"):
+            value = getattr(source, name, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+def retry_after(error) -> Optional[float]:
+    """Seconds from the Retry-After header of an error response, if it has one."""
+    headers = None
+    for source in (error, getattr(error, "response", None)):
+        headers = getattr(source, "headers", None)
+        if headers is not None:
+            break
+    if headers is None and isinstance(getattr(error, "resp", None), dict):
+        # httplib2 responses are dicts of lowercased headers
+        headers = error.resp
+    if not headers:
+        return None
+
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_transient(error) -> bool:
+    """Whether an error is worth retrying: network failures and transient HTTP statuses."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = status_code(error)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    return isinstance(error, _TRANSIENT_ERRORS)
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given retry (0-based)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def _next_delay(endpoint: str, error: Exception, attempt: int, trial: bool, retryable: Callable,
+                max_attempts: int, deadline: Optional[float], on_retry: Optional[Callable], span) -> Optional[float]:
+    """Record a failed attempt and decide on a retry: seconds to wait, or None to give up."""
+    circuit = breaker(endpoint)
+    if not retryable(error):
+        # A client error (400, 404...) says nothing about the endpoint's health
+        if trial:
+            circuit.release()
+        return None
+    # Being rate limited is backpressure, not a sign the endpoint is down
+    if status_code(error) != 429:
+        circuit.record_failure()
+    elif trial:
+        circuit.release()
+
+    # A retry the server scheduled with Retry-After doesn't spend the budget
+    delay = retry_after(error)
+    budgeted = delay is None
+    if budgeted:
+        delay = backoff_delay(attempt)
+    if (attempt + 1 >= max_attempts or delay > RETRY_MAX_DELAY or circuit.retry_in() > 0
+            or (deadline is not None and time.monotonic() + delay > deadline)
+            or (budgeted and not budget(endpoint).withdraw())):
+        return None
+
+    if span is not None:
+        span.retries += 1
+    metrics.count(f"retries.{endpoint}")
+    if on_retry is not None:
+        on_retry(error, delay)
+    print(f"{endpoint} request failed ({error}), retry {attempt + 1}/{max_attempts - 1} in {delay:.1f}s...")
+    return delay
+
+def call(endpoint: str, function: Callable, retryable: Callable = is_transient,
+         max_attempts: int = RETRY_MAX_ATTEMPTS, deadline: Optional[float] = None,
+         on_retry: Optional[Callable] = None, span=None):
+    """Call `function()` with retries, backoff and the endpoint's circuit breaker.
+
+    Errors that `retryable` rejects are raised at once (and count neither
+    for nor against the endpoint's health). Transient ones are retried after the
+    server's Retry-After, or exponential backoff with jitter, while attempts,
+    the optional `deadline` (a time.monotonic() value) and, for backoff
+    retries, the endpoint's retry budget allow. `on_retry(error, delay)`
+    runs before each wait, and each retry is counted on `span`.
+    """
+    circuit = breaker(endpoint)
+    budget(endpoint).deposit()
+    for attempt in range(max(1, max_attempts)):
+        trial = circuit.acquire()
+        if trial is None:
+            raise CircuitOpenError(endpoint, circuit.retry_in())
+        try:
+            result = function()
+        except Exception as e:
+            delay = _next_delay(endpoint, e, attempt, trial, retryable, max_attempts, deadline, on_retry, span)
+            if delay is None:
+                raise
+            time.sleep(delay)
+        except BaseException:
+            # Cancelled or interrupted: let the next call make the trial instead
+            if trial:
+                circuit.release()
+            raise
+        else:
+            circuit.record_success()
+            return result
+
+async def call_async(endpoint: str, function: Callable, retryable: Callable = is_transient,
+                     max_attempts: int = RETRY_MAX_ATTEMPTS, deadline: Optional[float] = None,
+                     on_retry: Optional[Callable] = None, span=None):
+    """call() for coroutines: awaits `function()` and sleeps without blocking the event loop.
+
+    Shares the circuit breakers and retry budgets of the synchronous calls.
+    """
+    circuit = breaker(endpoint)
+    budget(endpoint).deposit()
+    for attempt in range(max(1, max_attempts)):
+        trial = circuit.acquire()
+        if trial is None:
+            raise CircuitOpenError(endpoint, circuit.retry_in())
+        try:
+            result = await function()
+        except Exception as e:
+            delay = _next_delay(endpoint, e, attempt, trial, retryable, max_attempts, deadline, on_retry, span)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+        except BaseException:
+            # Cancelled or interrupted: let the next call make the trial instead
+            if trial:
+                circuit.release()
+            raise
+        else:
+            circuit.record_success()
+            return result
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the Anthropic Messages and Message Batches APIs.
+
+Point the pipeline at it with ANTHROPIC_BASE_URL=http://127.0.0.1:<port>.
+Every request gets a canned tagged summary after an optional injected
+latency; batches report "ended" once --batch-delay seconds have passed.
+Cache-marked system blocks are reported as cache writes the first time and
+cache reads afterwards, so prompt-cache logging can be checked locally.
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_RESPONSE = """<summary>
+Stub summary. The paper proposes a method and evaluates it against prior baselines.
+</summary>
+<tldr>The paper proposes a method that improves on prior baselines.</tldr>"""
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def _message(params, state=None):
+    content = json.dumps(params.get("messages", ""))
+
+    # Mimic prompt caching: a cache_control system block is "written" the
+    # first time it is seen and "read" on every later request
+    cache_read = cache_created = 0
+    system = params.get("system")
+    if isinstance(system, list) and state is not None:
+        prefix = json.dumps(system)
+        if any(block.get("cache_control") for block in system):
+            with state.lock:
+                if prefix in state.cached_prefixes:
+                    cache_read = len(prefix) // 4
+                else:
+                    state.cached_prefixes.add(prefix)
+                    cache_created = len(prefix) // 4
+        else:
+            content += prefix
+    elif system:
+        content += json.dumps(system)
+
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": params.get("model", "stub"),
+        "content": [{"type": "text", "text": STUB_RESPONSE}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": len(content) // 4,
+            "output_tokens": len(STUB_RESPONSE) // 4,
+            "cache_creation_input_tokens": cache_created,
+            "cache_read_input_tokens": cache_read,
+        },
+    }
+
+class StubState:
+    def __init__(self, latency=0.0, batch_delay=2.0):
+        self.latency = latency
+        self.batch_delay = batch_delay
+        self.batches = {}
+        self.cached_prefixes = set()
+        self.request_count = 0
+        self.lock = threading.RLock()
+
+    def batch_object(self, batch_id, base_url):
+        batch = self.batches[batch_id]
+        ended = batch["canceled"] or time.monotonic() >= batch["ready_at"]
+        count = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else count,
+                "succeeded": count if ended and not batch["canceled"] else 0,
+                "errored": 0,
+                "canceled": count if batch["canceled"] else 0,
+                "expired": 0,
+            },
+            "created_at": batch["created_at"].isoformat(),
+            "expires_at": (batch["created_at"] + timedelta(hours=24)).isoformat(),
+            "ended_at": _now().isoformat() if ended else None,
+            "cancel_initiated_at": None,
+            "archived_at": None,
+            "results_url": f"{base_url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _base_url(self):
+            host, port = self.server.server_address[:2]
+            return f"http://{host}:{port}"
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _send(self, status, body, content_type="application/json"):
+            data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _path(self):
+            return self.path.split("?", 1)[0].rstrip("/")
+
+        def do_POST(self):
+            with state.lock:
+                state.request_count += 1
+            time.sleep(state.latency)
+            path = self._path()
+            body = self._read_json()
+
+            if path == "/v1/messages":
+                return self._send(200, _message(body, state))
+
+            if path == "/v1/messages/batches":
+                batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+                with state.lock:
+                    state.batches[batch_id] = {
+                        "requests": body.get("requests", []),
+                        "created_at": _now(),
+                        "ready_at": time.monotonic() + state.batch_delay,
+                        "canceled": False,
+                    }
+                    return self._send(200, state.batch_object(batch_id, self._base_url()))
+
+            if path.startswith("/v1/messages/batches/") and path.endswith("/cancel"):
+                batch_id = path.split("/")[4]
+                with state.lock:
+                    if batch_id not in state.batches:
+                        return self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": batch_id}})
+                    state.batches[batch_id]["canceled"] = True
+                    return self._send(200, state.batch_object(batch_id, self._base_url()))
+
+            self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": path}})
+
+        def do_GET(self):
+            with state.lock:
+                state.request_count += 1
+            path = self._path()
+            parts = path.split("/")
+
+            if len(parts) >= 5 and path.startswith("/v1/messages/batches/"):
+                batch_id = parts[4]
+                with state.lock:
+                    if batch_id not in state.batches:
+                        return self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": batch_id}})
+                    if path.endswith("/results"):
+                        batch = state.batches[batch_id]
+                        lines = []
+                        for request in batch["requests"]:
+                            if batch["canceled"]:
+                                result = {"type": "canceled"}
+                            else:
+                                result = {"type": "succeeded", "message": _message(request.get("params", {}), state)}
+                            lines.append(json.dumps({"custom_id": request["custom_id"], "result": result}))
+                        return self._send(200, "\n".join(lines).encode("utf-8"), "application/binary")
+                    return self._send(200, state.batch_object(batch_id, self._base_url()))
+
+            self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": path}})
+
+    return Handler
+
+def start_server(port=0, latency=0.0, batch_delay=2.0):
+    """Start the stub in a background thread. Returns (server, state)."""
+    state = StubState(latency=latency, batch_delay=batch_delay)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Anthropic API stub")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every POST")
+    parser.add_argument("--batch-delay", type=float, default=2.0, help="seconds until a batch ends")
+    args = parser.parse_args()
+
+    server, _ = start_server(args.port, args.latency, args.batch_delay)
+    print(f"Anthropic stub listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
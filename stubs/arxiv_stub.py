@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the arXiv export API and PDF downloads.
+
+Point the pipeline at it with ARXIV_API_URL=http://127.0.0.1:<port>/api/query.
+/api/query answers id_list and ti:"..." title searches from a recorded Atom
+feed (benchmarks/fixtures/arxiv/entries.atom by default), with the entries'
+PDF links rewritten to this stub. Any other GET path serves the sample PDF,
+so non-arXiv PDF links can be redirected here too.
+"""
+
+import argparse
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+DEFAULT_FEED = os.path.join(FIXTURES, "arxiv", "entries.atom")
+DEFAULT_PDF = os.path.join(FIXTURES, "pdf", "sample.pdf")
+
+_ENTRY = re.compile(r'<entry>.*?</entry>', re.DOTALL)
+_ENTRY_ID = re.compile(r'<id>http://arxiv\.org/abs/([^<]+)</id>')
+_ENTRY_TITLE = re.compile(r'<title>([^<]*)</title>')
+_TITLE_PHRASE = re.compile(r'ti:"([^"]*)"')
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+FEED_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title type="html">ArXiv Query (stub)</title>
+  <id>http://arxiv.org/api/stub</id>
+  <updated>2024-09-01T00:00:00-04:00</updated>
+  <opensearch:totalResults xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">{total}</opensearch:totalResults>
+  <opensearch:startIndex xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">{start}</opensearch:startIndex>
+  <opensearch:itemsPerPage xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">{page_size}</opensearch:itemsPerPage>
+{entries}
+</feed>
+"""
+
+def _words(text):
+    return " " + " ".join(_NON_WORD.sub(" ", text.lower()).split()) + " "
+
+def _strip_version(arxiv_id):
+    return re.sub(r'v\d+$', '', arxiv_id)
+
+class StubState:
+    def __init__(self, feed_path=DEFAULT_FEED, pdf_path=DEFAULT_PDF, latency=0.0, pdf_latency=0.0):
+        self.latency = latency
+        self.pdf_latency = pdf_latency
+        with open(pdf_path, "rb") as f:
+            self.pdf = f.read()
+
+        # (versionless id, normalized title, raw entry XML)
+        self.entries = []
+        with open(feed_path, encoding="utf-8") as f:
+            for entry in _ENTRY.findall(f.read()):
+                arxiv_id = _ENTRY_ID.search(entry).group(1)
+                title = _ENTRY_TITLE.search(entry).group(1).replace("&amp;", "&")
+                self.entries.append((_strip_version(arxiv_id), _words(title), entry))
+
+        self.query_count = 0
+        self.pdf_count = 0
+        self.lock = threading.Lock()
+
+    def search(self, params):
+        """Entries matching an id_list or a search_query of OR-ed ti:"..." phrases."""
+        id_list = [_strip_version(i) for i in params.get("id_list", [""])[0].split(",") if i]
+        if id_list:
+            by_id = {arxiv_id: entry for arxiv_id, _, entry in self.entries}
+            return [by_id[i] for i in id_list if i in by_id]
+
+        phrases = [_words(phrase) for phrase in _TITLE_PHRASE.findall(params.get("search_query", [""])[0])]
+        return [entry for _, title, entry in self.entries
+                if any(phrase.strip() and phrase in title for phrase in phrases)]
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, data, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path == "/api/query":
+                return self._query(parse_qs(parts.query))
+
+            with state.lock:
+                state.pdf_count += 1
+            time.sleep(state.pdf_latency)
+            self._send(200, state.pdf, "application/pdf")
+
+        def _query(self, params):
+            with state.lock:
+                state.query_count += 1
+            time.sleep(state.latency)
+
+            matches = state.search(params)
+            start = int(params.get("start", ["0"])[0])
+            page_size = int(params.get("max_results", ["10"])[0])
+            page = matches[start:start + page_size]
+            base_url = f"http://{self.headers.get('Host')}"
+            feed = FEED_TEMPLATE.format(
+                total=len(matches), start=start, page_size=page_size,
+                entries="\n".join(page).replace("http://arxiv.org/pdf/", f"{base_url}/pdf/")
+            )
+            self._send(200, feed.encode("utf-8"), "application/atom+xml; charset=utf-8")
+
+    return Handler
+
+def start_server(port=0, latency=0.0, pdf_latency=0.0, feed_path=DEFAULT_FEED, pdf_path=DEFAULT_PDF):
+    """Start the stub in a background thread. Returns (server, state)."""
+    state = StubState(feed_path, pdf_path, latency=latency, pdf_latency=pdf_latency)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local arXiv API and PDF stub")
+    parser.add_argument("--port", type=int, default=8092)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every API query")
+    parser.add_argument("--pdf-latency", type=float, default=0.0, help="seconds added to every PDF download")
+    parser.add_argument("--feed", default=DEFAULT_FEED, help="recorded Atom feed to answer queries from")
+    parser.add_argument("--pdf", default=DEFAULT_PDF, help="PDF served for every download")
+    args = parser.parse_args()
+
+    server, _ = start_server(args.port, args.latency, args.pdf_latency, args.feed, args.pdf)
+    print(f"arXiv stub listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
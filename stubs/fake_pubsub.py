@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Local stand-in for a Pub/Sub push subscription.
+
+POSTs Gmail-style change notifications to push_listener.py, shaped exactly
+like the real push requests, so event-driven mode can be tried without a
+Google Cloud project:
+    python push_listener.py --no-watch
+    python stubs/fake_pubsub.py --url "http://127.0.0.1:8085/?token=$PUSH_TOKEN" --count 3 --interval 5
+"""
+
+import argparse
+import base64
+import json
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+
+def push_body(email_address, history_id, subscription="projects/local/subscriptions/gmail-push"):
+    """A Pub/Sub push request body carrying one Gmail notification."""
+    data = json.dumps({"emailAddress": email_address, "historyId": history_id})
+    return {
+        "message": {
+            "data": base64.b64encode(data.encode("utf-8")).decode("ascii"),
+            "messageId": uuid.uuid4().hex,
+            "publishTime": datetime.now(timezone.utc).isoformat(),
+            "attributes": {},
+        },
+        "subscription": subscription,
+    }
+
+def send_notification(url, email_address="me@example.com", history_id=1):
+    """Deliver one notification. Returns the listener's HTTP status."""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(push_body(email_address, history_id)).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send fake Gmail push notifications")
+    parser.add_argument("--url", default="http://127.0.0.1:8085/", help="push endpoint, including ?token=")
+    parser.add_argument("--email", default="me@example.com")
+    parser.add_argument("--history-id", type=int, default=1, help="history id of the first notification")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between notifications")
+    args = parser.parse_args()
+
+    for i in range(args.count):
+        if i:
+            time.sleep(args.interval)
+        status = send_notification(args.url, args.email, args.history_id + i)
+        print(f"Notification {i + 1}/{args.count} (history id {args.history_id + i}): HTTP {status}")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the Notion pages, blocks and database query endpoints.
+
+Point the pipeline at it with NOTION_BASE_URL=http://127.0.0.1:<port>.
+Requests beyond --rate per second are answered with 429 and a Retry-After
+header, like the real API, so the client-side limiter and backoff can be
+exercised locally.
+
+Measure bulk write throughput against an in-process stub with:
+    python stubs/notion_stub.py --bench 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubState:
+    def __init__(self, latency=0.0, rate=3.0):
+        self.latency = latency
+        self.rate = rate
+        self.pages = []
+        self.blocks = {}
+        self.request_count = 0
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def allow(self):
+        """Fixed one-second window: True if this request fits under the rate."""
+        with self.lock:
+            self.request_count += 1
+            if self.rate <= 0:
+                return True
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start, self._window_count = now, 0
+            if self._window_count >= self.rate:
+                self.rate_limited += 1
+                return False
+            self._window_count += 1
+            return True
+
+def _error(status, code, message):
+    return status, {"object": "error", "status": status, "code": code, "message": message}
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self, method):
+            body = self._read_json()
+            if not state.allow():
+                status, error = _error(429, "rate_limited", "You have been rate limited.")
+                return self._send(status, error, {"Retry-After": "1"})
+            time.sleep(state.latency)
+
+            parts = self.path.split("?", 1)[0].strip("/").split("/")
+            if method == "POST" and parts == ["v1", "pages"]:
+                return self._send(200, self._create_page(body))
+            if method == "PATCH" and len(parts) == 4 and parts[:2] == ["v1", "blocks"] and parts[3] == "children":
+                return self._append_children(parts[2], body)
+            if method == "POST" and len(parts) == 4 and parts[:2] == ["v1", "databases"] and parts[3] == "query":
+                return self._send(200, self._query(body))
+            self._send(*_error(404, "object_not_found", self.path))
+
+        def _create_page(self, body):
+            page = {
+                "object": "page",
+                "id": str(uuid.uuid4()),
+                "parent": body.get("parent", {}),
+                "properties": body.get("properties", {}),
+            }
+            with state.lock:
+                state.pages.append(page)
+                state.blocks[page["id"]] = list(body.get("children", []))
+            return page
+
+        def _append_children(self, block_id, body):
+            with state.lock:
+                if block_id not in state.blocks:
+                    return self._send(*_error(404, "object_not_found", block_id))
+                state.blocks[block_id].extend(body.get("children", []))
+            self._send(200, {"object": "list", "results": body.get("children", []), "has_more": False})
+
+        def _query(self, body):
+            page_size = min(int(body.get("page_size", 100)), 100)
+            start = int(body.get("start_cursor") or 0)
+            with state.lock:
+                results = state.pages[start:start + page_size]
+                has_more = start + page_size < len(state.pages)
+            return {
+                "object": "list",
+                "results": results,
+                "has_more": has_more,
+                "next_cursor": str(start + page_size) if has_more else None,
+            }
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def do_PATCH(self):
+            self._handle("PATCH")
+
+    return Handler
+
+def start_server(port=0, latency=0.0, rate=3.0):
+    """Start the stub in a background thread. Returns (server, state)."""
+    state = StubState(latency=latency, rate=rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+def run_bench(count, latency, rate):
+    server, state = start_server(latency=latency, rate=rate)
+    os.environ["NOTION_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import notion_handler
+
+    entries = [
+        dict(seed_paper="Seed paper", citing_title=f"Citing paper {i}", summary="Stub summary. " * 200,
+             tldr="Stub TLDR.", gmail_msg_id=f"msg{i}", citing_url=f"http://arxiv.org/abs/2401.{i:05d}")
+        for i in range(count)
+    ]
+    started = time.monotonic()
+    results = notion_handler.add_many_to_notion_database(entries)
+    elapsed = time.monotonic() - started
+
+    print(f"{sum(results)}/{count} pages written in {elapsed:.1f}s "
+          f"({sum(results) / elapsed:.2f} pages/s), {state.request_count} requests, "
+          f"{state.rate_limited} rate limited (429)")
+    server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Notion API stub")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--rate", type=float, default=3.0, help="requests per second before answering 429 (0 = unlimited)")
+    parser.add_argument("--bench", type=int, metavar="N", help="bulk-write N pages to an in-process stub and report throughput")
+    args = parser.parse_args()
+
+    if args.bench:
+        run_bench(args.bench, args.latency, args.rate)
+    else:
+        server, _ = start_server(args.port, args.latency, args.rate)
+        print(f"Notion stub listening on http://127.0.0.1:{server.server_address[1]}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
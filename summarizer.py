@@ -1,5 +1,8 @@
 import os
+import re
 import sys
+import time
+from typing import List, Tuple
 
 # Completely disable any proxy configuration
 for key in list(os.environ.keys()):
@@ -16,23 +19,109 @@ def patched_init(self, *args, **kwargs):
 
 httpx.Client.__init__ = patched_init
 
-from anthropic import Anthropic
-from config import SUMMARY_PROMPT, ANTHROPIC_API_KEY
+from anthropic import Anthropic, AsyncAnthropic, APIConnectionError
+from config import (SUMMARY_PROMPT, ANTHROPIC_API_KEY, SUMMARY_BATCH_POLL_INTERVAL,
+                    SUMMARY_BATCH_TIMEOUT)
+from concurrency import stage_slot, stage_slot_async
+import metrics
+import resilience
+
+PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+
+def _client() -> Anthropic:
+    # Retries go through resilience.call, not the SDK's own retry loop
+    return Anthropic(api_key=ANTHROPIC_API_KEY, max_retries=0)
+
+def async_client(http_client: httpx.AsyncClient) -> AsyncAnthropic:
+    """A long-lived async client on a pooled connection, for the async engine."""
+    return AsyncAnthropic(api_key=ANTHROPIC_API_KEY, max_retries=0, http_client=http_client)
+
+def _is_retryable(error) -> bool:
+    return isinstance(error, APIConnectionError) or resilience.is_transient(error)
+
+def _request(span, function, **params):
+    """One Anthropic API call under the stage limit, retrying transient failures."""
+    def attempt():
+        with stage_slot("anthropic"):
+            return function(**params)
+    return resilience.call("anthropic", attempt, retryable=_is_retryable, span=span)
+
+async def _request_async(span, function, **params):
+    """_request for coroutines on an AsyncAnthropic client."""
+    async def attempt():
+        async with stage_slot_async("anthropic"):
+            return await function(**params)
+    return await resilience.call_async("anthropic", attempt, retryable=_is_retryable, span=span)
+
+def _cached_system(instructions: str) -> list:
+    """System prompt as a single cacheable block.
+
+    The instructions are identical for every paper, so marking them with
+    cache_control lets repeat requests reuse the cached prefix; only the
+    paper text in the user turn varies.
+    """
+    return [{"type": "text", "text": instructions, "cache_control": {"type": "ephemeral"}}]
+
+def _paper_message(paper_content: str) -> list:
+    return [{"role": "user", "content": f"Paper Content:\n\n{paper_content}"}]
+
+def log_cache_usage(usage) -> int:
+    """Print prompt-cache hit/miss token counts from a response's usage block.
+
+    Returns the total tokens used (input, cached input and output).
+    """
+    if usage is None:
+        return 0
+    read = getattr(usage, "cache_read_input_tokens", None) or 0
+    created = getattr(usage, "cache_creation_input_tokens", None) or 0
+    print(f"Prompt cache: {read} tokens read, {created} tokens written, "
+          f"{usage.input_tokens} uncached input tokens, {usage.output_tokens} output tokens")
+    metrics.count("cache.prompt_tokens.hit", read)
+    metrics.count("cache.prompt_tokens.miss", created + usage.input_tokens)
+    return read + created + usage.input_tokens + usage.output_tokens
+
+def _summary_params(paper_content: str) -> dict:
+    """Messages API parameters for a summary request."""
+    return {
+        "model": "claude-opus-4-5-20251101",
+        "max_tokens": 2000,
+        "system": _cached_system(SUMMARY_PROMPT),
+        "messages": _paper_message(paper_content)
+    }
+
+def _tldr_params(full_summary: str) -> dict:
+    """Messages API parameters for a one-sentence TLDR of a summary."""
+    return {
+        "model": "claude-opus-4-5-20251101",
+        "max_tokens": 150,
+        "messages": [
+            {
+                "role": "user",
+                "content": f"""Based on this paper summary, generate a single, complete sentence that captures the main contribution or finding. The sentence should be grammatically complete and end with a period.
+
+Summary:
+{full_summary}
+
+Generate only the one-sentence TLDR, nothing else."""
+            }
+        ]
+    }
+
+def _tldr_text(message) -> str:
+    """The TLDR sentence in a response to a _tldr_params request."""
+    tldr = message.content[0].text.strip()
+    # Ensure it ends with a period
+    if tldr and not tldr.endswith('.'):
+        tldr = tldr + '.'
+    return tldr
 
 def summarize_paper(paper_content: str) -> str:
     """Summarize paper using Claude."""
     try:
-        client = Anthropic(api_key=ANTHROPIC_API_KEY)
-        message = client.messages.create(
-            model="claude-opus-4-5-20251101",
-            max_tokens=2000,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"{SUMMARY_PROMPT}\n\n---\n\nPaper Content:\n\n{paper_content}"
-                }
-            ]
-        )
+        client = _client()
+        with metrics.span("anthropic.summarize") as span:
+            message = _request(span, client.beta.prompt_caching.messages.create, **_summary_params(paper_content))
+            span.tokens = log_cache_usage(message.usage)
 
         return message.content[0].text
     except Exception as e:
@@ -44,31 +133,193 @@ def summarize_paper(paper_content: str) -> str:
 def generate_tldr(paper_content: str, full_summary: str) -> str:
     """Generate a one-sentence TLDR using Claude."""
     try:
-        client = Anthropic(api_key=ANTHROPIC_API_KEY)
-        message = client.messages.create(
-            model="claude-opus-4-5-20251101",
-            max_tokens=150,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""Based on this paper summary, generate a single, complete sentence that captures the main contribution or finding. The sentence should be grammatically complete and end with a period.
+        client = _client()
+        with metrics.span("anthropic.tldr") as span:
+            message = _request(span, client.messages.create, **_tldr_params(full_summary))
+            span.tokens = message.usage.input_tokens + message.usage.output_tokens
 
-Summary:
-{full_summary}
+        return _tldr_text(message)
+    except Exception as e:
+        print(f"Error generating TLDR: {e}")
+        import traceback
+        traceback.print_exc()
+        return ""
 
-Generate only the one-sentence TLDR, nothing else."""
-                }
-            ]
-        )
-
-        tldr = message.content[0].text.strip()
-        # Ensure it ends with a period
-        if tldr and not tldr.endswith('.'):
-            tldr = tldr + '.'
-        return tldr
+
+COMBINED_OUTPUT_INSTRUCTIONS = """Format your answer exactly as follows, with nothing before or after the tags:
+<summary>
+(the structured summary)
+</summary>
+<tldr>(a single, grammatically complete sentence that captures the main contribution or finding)</tldr>"""
+
+_SUMMARY_TAG = re.compile(r'<summary>\s*(.*?)\s*</summary>', re.DOTALL)
+_TLDR_TAG = re.compile(r'<tldr>\s*(.*?)\s*</tldr>', re.DOTALL)
+# Leftover tags around an unterminated summary (e.g. a response cut off at max_tokens)
+_STRAY_SUMMARY_TAGS = re.compile(r'^\s*<summary>\s*|\s*</summary>\s*$')
+
+def parse_summary_response(text: str) -> Tuple[str, str]:
+    """Split a tagged <summary>/<tldr> response. Returns (summary, tldr).
+
+    If the tags are missing the whole response is treated as the summary and
+    the TLDR is returned empty so the caller can fall back.
+    """
+    summary_match = _SUMMARY_TAG.search(text)
+    tldr_match = _TLDR_TAG.search(text)
+
+    summary = summary_match.group(1) if summary_match else _STRAY_SUMMARY_TAGS.sub('', _TLDR_TAG.sub('', text))
+    tldr = " ".join(tldr_match.group(1).split()) if tldr_match else ""
+    if tldr and not tldr.endswith('.'):
+        tldr = tldr + '.'
+    return summary, tldr
+
+def _combined_params(paper_content: str) -> dict:
+    """Messages API parameters for a combined summary + TLDR request."""
+    return {
+        "model": "claude-opus-4-5-20251101",
+        "max_tokens": 2200,
+        "system": _cached_system(f"{SUMMARY_PROMPT}\n\n{COMBINED_OUTPUT_INSTRUCTIONS}"),
+        "messages": _paper_message(paper_content)
+    }
+
+def _truncated(message) -> bool:
+    """Whether a combined response was cut off before its closing tags."""
+    if message.stop_reason != "max_tokens":
+        return False
+    print("Combined summary response was cut off at max_tokens")
+    metrics.count("anthropic.truncated")
+    return True
+
+def summarize_with_tldr(paper_content: str) -> Tuple[str, str]:
+    """Summarize paper and generate its one-sentence TLDR in a single Claude call.
+
+    Returns (summary, tldr); tldr is "" if it couldn't be parsed out, and both
+    are "" if the request failed.
+    """
+    try:
+        client = _client()
+        with metrics.span("anthropic.summarize_tldr") as span:
+            message = _request(span, client.beta.prompt_caching.messages.create, **_combined_params(paper_content))
+            span.tokens = log_cache_usage(message.usage)
+
+        if _truncated(message):
+            summary = summarize_paper(paper_content)
+            return summary, (generate_tldr(paper_content, summary) if summary else "")
+        return parse_summary_response(message.content[0].text)
+    except Exception as e:
+        print(f"Error summarizing paper: {e}")
+        import traceback
+        traceback.print_exc()
+        return "", ""
+
+async def summarize_paper_async(client: AsyncAnthropic, paper_content: str) -> str:
+    """summarize_paper on a shared AsyncAnthropic client."""
+    try:
+        with metrics.span("anthropic.summarize") as span:
+            message = await _request_async(span, client.beta.prompt_caching.messages.create,
+                                           **_summary_params(paper_content))
+            span.tokens = log_cache_usage(message.usage)
+
+        return message.content[0].text
+    except Exception as e:
+        print(f"Error summarizing paper: {e}")
+        import traceback
+        traceback.print_exc()
+        return ""
+
+async def generate_tldr_async(client: AsyncAnthropic, paper_content: str, full_summary: str) -> str:
+    """generate_tldr on a shared AsyncAnthropic client."""
+    try:
+        with metrics.span("anthropic.tldr") as span:
+            message = await _request_async(span, client.messages.create, **_tldr_params(full_summary))
+            span.tokens = message.usage.input_tokens + message.usage.output_tokens
+
+        return _tldr_text(message)
     except Exception as e:
         print(f"Error generating TLDR: {e}")
         import traceback
         traceback.print_exc()
         return ""
 
+async def summarize_with_tldr_async(client: AsyncAnthropic, paper_content: str) -> Tuple[str, str]:
+    """summarize_with_tldr on a shared AsyncAnthropic client."""
+    try:
+        with metrics.span("anthropic.summarize_tldr") as span:
+            message = await _request_async(span, client.beta.prompt_caching.messages.create,
+                                           **_combined_params(paper_content))
+            span.tokens = log_cache_usage(message.usage)
+
+        if _truncated(message):
+            summary = await summarize_paper_async(client, paper_content)
+            return summary, (await generate_tldr_async(client, paper_content, summary) if summary else "")
+        return parse_summary_response(message.content[0].text)
+    except Exception as e:
+        print(f"Error summarizing paper: {e}")
+        import traceback
+        traceback.print_exc()
+        return "", ""
+
+def summarize_batch(paper_contents: List[str]) -> List[Tuple[str, str]]:
+    """Summarize many papers through the Message Batches API.
+
+    Submits one combined summary + TLDR request per paper, polls until the
+    batch has ended (or SUMMARY_BATCH_TIMEOUT passes, in which case it is
+    cancelled) and returns (summary, tldr) per paper in input order.
+    Papers without a successful, complete result get ("", "").
+    """
+    results = [("", "")] * len(paper_contents)
+    if not paper_contents:
+        return results
+
+    try:
+        with metrics.span("anthropic.batch", paper="") as span:
+            return _run_batch(paper_contents, results, span)
+    except Exception as e:
+        print(f"Error running message batch: {e}")
+        import traceback
+        traceback.print_exc()
+        return results
+
+def _run_batch(paper_contents: List[str], results: List[Tuple[str, str]], span) -> List[Tuple[str, str]]:
+    client = _client()
+    batches = client.beta.messages.batches
+
+    batch = _request(
+        span, batches.create,
+        requests=[
+            {"custom_id": f"paper-{index}", "params": _combined_params(content)}
+            for index, content in enumerate(paper_contents)
+        ],
+        betas=[PROMPT_CACHING_BETA]
+    )
+    print(f"Submitted message batch {batch.id} with {len(paper_contents)} papers")
+
+    deadline = time.monotonic() + SUMMARY_BATCH_TIMEOUT
+    polls_after_cancel = 0
+    while batch.processing_status != "ended":
+        if time.monotonic() > deadline:
+            # A cancelled batch still returns the results that finished
+            # before it stopped, once it reaches "ended"
+            if polls_after_cancel == 0:
+                print(f"Message batch {batch.id} timed out, cancelling")
+                _request(span, batches.cancel, message_batch_id=batch.id)
+            elif polls_after_cancel >= 10:
+                return results
+            polls_after_cancel += 1
+        time.sleep(SUMMARY_BATCH_POLL_INTERVAL)
+        batch = _request(span, batches.retrieve, message_batch_id=batch.id)
+
+    # Results come back in arbitrary order; map them by custom_id
+    entries = _request(span, lambda: list(batches.results(batch.id)))
+    for entry in entries:
+        index = int(entry.custom_id.rsplit("-", 1)[-1])
+        if entry.result.type == "succeeded":
+            span.tokens += log_cache_usage(entry.result.message.usage)
+            # A truncated result stays empty, so the paper is retried on the interactive path
+            if not _truncated(entry.result.message):
+                results[index] = parse_summary_response(entry.result.message.content[0].text)
+        else:
+            print(f"Batch request {entry.custom_id} {entry.result.type}")
+
+    counts = batch.request_counts
+    print(f"Message batch {batch.id} ended: {counts.succeeded} succeeded, {counts.errored} errored")
+    return results
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+"""
+Local similarity index of papers that were already summarized.
+
+Each summarized paper's title + abstract is turned into a hashed n-gram
+vector (word unigrams and bigrams, signed feature hashing into
+SUMMARY_INDEX_DIM dimensions, L2-normalized) and stored with its summary
+and TLDR. Before summarizing, main.py looks the paper up: revised versions
+and near-duplicate titles of the same work (v1/v2, workshop vs. conference)
+whose cosine similarity reaches SUMMARY_REUSE_THRESHOLD reuse the stored
+summary instead of another Claude call. Titles alone are too short to tell
+papers apart ("Improved Denoising Diffusion Probabilistic Models" vs.
+"Denoising Diffusion Probabilistic Models"), so papers without an abstract
+are not indexed and only reuse a summary stored under the same normalized
+title or arXiv id.
+
+Vectors live in SQLite and are kept in memory as one NumPy matrix, so a
+lookup is a single matrix-vector product.
+
+Show the closest indexed papers for a title (and optional abstract) with:
+    python summary_index.py --similar "Some paper title" [--abstract "..."]
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+import metrics
+from config import SUMMARY_INDEX_FILE, SUMMARY_INDEX_DIM, SUMMARY_REUSE_THRESHOLD
+from titles import normalize_title
+
+# Words too common in paper abstracts to tell two papers apart
+_STOPWORDS = frozenset("""
+a an and are as at be by can for from has have in into is it its of on or our such that the their this
+to we which with while these those than then via using based show shows paper propose proposed approach
+""".split())
+_WORD = re.compile(r'[a-z0-9]+')
+_ARXIV_VERSION = re.compile(r'v\d+$')
+
+_lock = threading.Lock()
+_conn = None
+# In-memory copy of the index: row i of _matrix is the vector of _entries[i];
+# _matrix has spare capacity beyond len(_entries)
+_entries: List["IndexedSummary"] = []
+_matrix = None
+
+@dataclass
+class IndexedSummary:
+    """A stored summary, and how similar its paper is to the one looked up."""
+    title: str
+    arxiv_id: str
+    summary: str
+    tldr: str
+    score: float = 0.0
+
+def vectorize(title: str, abstract: str = "") -> np.ndarray:
+    """Unit-length hashed n-gram vector of a paper's title and abstract (zero if it has no words)."""
+    words = [word for word in _WORD.findall(normalize_title(f"{title} {abstract or ''}"))
+             if word not in _STOPWORDS]
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    vector = np.zeros(SUMMARY_INDEX_DIM, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.array([zlib.crc32(feature.encode("utf-8")) for feature in features], dtype=np.uint32)
+    # The top hash bit picks the sign, so collisions cancel out instead of adding up
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, hashes % SUMMARY_INDEX_DIM, signs)
+    # Sublinear term frequency: a word repeated ten times shouldn't dominate
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def _connect():
+    global _conn
+    if _conn is None:
+        directory = os.path.dirname(SUMMARY_INDEX_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _conn = sqlite3.connect(SUMMARY_INDEX_FILE, check_same_thread=False)
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS summaries (
+                title_key TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                abstract TEXT NOT NULL DEFAULT '',
+                arxiv_id TEXT NOT NULL DEFAULT '',
+                vector BLOB NOT NULL,
+                summary TEXT NOT NULL,
+                tldr TEXT NOT NULL DEFAULT '',
+                created_at REAL NOT NULL
+            )"""
+        )
+        _conn.commit()
+        _load(_conn)
+    return _conn
+
+def _load(conn):
+    """Read every stored vector into the in-memory matrix."""
+    global _matrix
+    rows = conn.execute(
+        "SELECT title_key, title, abstract, arxiv_id, vector, summary, tldr FROM summaries ORDER BY created_at"
+    ).fetchall()
+    _entries.clear()
+    _matrix = np.zeros((max(64, len(rows)), SUMMARY_INDEX_DIM), dtype=np.float32)
+    stale = []
+    for title_key, title, abstract, arxiv_id, blob, summary, tldr in rows:
+        if not abstract:
+            # Indexed by title alone (before abstracts were required): exact matches only
+            continue
+        vector = np.frombuffer(blob, dtype=np.float32)
+        if vector.shape[0] != SUMMARY_INDEX_DIM:
+            # Stored with another SUMMARY_INDEX_DIM: re-embed from the saved text
+            vector = vectorize(title, abstract)
+            stale.append((vector.tobytes(), title_key))
+        _matrix[len(_entries)] = vector
+        _entries.append(IndexedSummary(title, arxiv_id, summary, tldr))
+    if stale:
+        conn.executemany("UPDATE summaries SET vector = ? WHERE title_key = ?", stale)
+        conn.commit()
+
+def _append(vector: np.ndarray, entry: IndexedSummary):
+    global _matrix
+    if len(_entries) == _matrix.shape[0]:
+        grown = np.zeros((_matrix.shape[0] * 2, SUMMARY_INDEX_DIM), dtype=np.float32)
+        grown[:len(_entries)] = _matrix[:len(_entries)]
+        _matrix = grown
+    _matrix[len(_entries)] = vector
+    _entries.append(entry)
+
+def _top_k(vector: np.ndarray, k: int) -> List[IndexedSummary]:
+    count = len(_entries)
+    if count == 0 or k <= 0 or not vector.any():
+        return []
+    # Rows and query are unit length, so the dot products are the cosine similarities
+    scores = _matrix[:count] @ vector
+    k = min(k, count)
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best])]
+    return [IndexedSummary(_entries[i].title, _entries[i].arxiv_id, _entries[i].summary, _entries[i].tldr,
+                           float(scores[i])) for i in best]
+
+def similar(title: str, abstract: str = "", k: int = 5) -> List[IndexedSummary]:
+    """The k indexed papers most similar to this one, most similar first."""
+    vector = vectorize(title, abstract)
+    try:
+        with _lock:
+            _connect()
+            return _top_k(vector, k)
+    except Exception as e:
+        print(f"Error reading summary index: {e}")
+        return []
+
+def _same_paper(title: str, arxiv_id: str) -> Optional[IndexedSummary]:
+    """The stored summary with the same normalized title or arXiv id (any version)."""
+    base_id = _ARXIV_VERSION.sub("", arxiv_id or "")
+    try:
+        with _lock:
+            conn = _connect()
+            rows = conn.execute(
+                "SELECT title_key, title, arxiv_id, summary, tldr FROM summaries "
+                "WHERE title_key = ? OR (? != '' AND arxiv_id LIKE ? || '%')",
+                (normalize_title(title), base_id, base_id)
+            ).fetchall()
+    except Exception as e:
+        print(f"Error reading summary index: {e}")
+        return None
+    for title_key, stored_title, stored_id, summary, tldr in rows:
+        if title_key == normalize_title(title) or (base_id and _ARXIV_VERSION.sub("", stored_id) == base_id):
+            return IndexedSummary(stored_title, stored_id, summary, tldr, 1.0)
+    return None
+
+def find_reusable(title: str, abstract: str = "", arxiv_id: str = "") -> Optional[IndexedSummary]:
+    """The stored summary of the same work, if there is one.
+
+    That is a summary stored under the same normalized title or arXiv id,
+    or, for a paper with an abstract, an indexed paper at least
+    SUMMARY_REUSE_THRESHOLD similar.
+    """
+    if SUMMARY_REUSE_THRESHOLD <= 0:
+        return None
+    match = _same_paper(title, arxiv_id)
+    if match is None and abstract:
+        matches = similar(title, abstract, k=1)
+        match = matches[0] if matches and matches[0].score >= SUMMARY_REUSE_THRESHOLD else None
+    metrics.count(f"cache.summary.{'miss' if match is None else 'hit'}")
+    return match
+
+def add(title: str, abstract: str, arxiv_id: str, summary: str, tldr: str):
+    """Store a paper's summary and TLDR for later reuse (replacing any earlier one for the same title).
+
+    Papers without an abstract are not stored.
+    """
+    if not summary or not abstract or SUMMARY_REUSE_THRESHOLD <= 0:
+        return
+    title_key = normalize_title(title)
+    vector = vectorize(title, abstract)
+    entry = IndexedSummary(title, arxiv_id or "", summary, tldr or "")
+    try:
+        with _lock:
+            conn = _connect()
+            exists = conn.execute("SELECT 1 FROM summaries WHERE title_key = ?", (title_key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries "
+                "(title_key, title, abstract, arxiv_id, vector, summary, tldr, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (title_key, title, abstract or "", entry.arxiv_id, vector.tobytes(), summary, entry.tldr,
+                 time.time())
+            )
+            conn.commit()
+            if exists:
+                _load(conn)
+            else:
+                _append(vector, entry)
+    except Exception as e:
+        print(f"Error writing summary index: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summary reuse index")
+    parser.add_argument("--similar", metavar="TITLE", help="show the indexed papers closest to this title")
+    parser.add_argument("--abstract", default="", help="abstract to include with --similar")
+    parser.add_argument("-k", type=int, default=5, help="number of matches to show")
+    args = parser.parse_args()
+
+    if args.similar:
+        for match in similar(args.similar, args.abstract, args.k):
+            marker = "*" if match.score >= SUMMARY_REUSE_THRESHOLD else " "
+            print(f"{marker} {match.score:.3f}  {match.title}  {match.arxiv_id}")
+    else:
+        with _lock:
+            _connect()
+            total = len(_entries)
+        print(f"{total} summaries in {SUMMARY_INDEX_FILE}")
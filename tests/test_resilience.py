@@ -0,0 +1,50 @@
+import time
+import pytest
+import resilience
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+def _fail(status):
+    def function():
+        raise StatusError(status)
+    return function
+
+@pytest.fixture
+def circuit(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 0.0)
+    circuit = resilience.breaker("test.trial")
+    circuit.threshold, circuit.reset_timeout = 1, 0.05
+    yield circuit
+    resilience._breakers.pop("test.trial", None)
+
+def _open(circuit):
+    with pytest.raises(StatusError):
+        resilience.call("test.trial", _fail(503), max_attempts=1)
+    assert circuit.acquire() is None
+    time.sleep(circuit.reset_timeout)
+
+def test_rate_limited_trial_is_released(circuit):
+    _open(circuit)
+    with pytest.raises(StatusError):
+        resilience.call("test.trial", _fail(429), max_attempts=1)
+    assert resilience.call("test.trial", lambda: "ok") == "ok"
+    assert circuit.acquire() is False
+
+def test_rate_limited_trial_is_retried(circuit):
+    _open(circuit)
+    responses = [StatusError(429)]
+    def function():
+        if responses:
+            raise responses.pop()
+        return "ok"
+    assert resilience.call("test.trial", function, max_attempts=2) == "ok"
+    assert circuit.acquire() is False
+
+def test_client_error_keeps_circuit_open(circuit):
+    _open(circuit)
+    with pytest.raises(StatusError):
+        resilience.call("test.trial", _fail(404), max_attempts=1)
+    assert circuit.retry_in() == 0.0 and circuit.acquire() is True
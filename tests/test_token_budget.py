@@ -0,0 +1,27 @@
+import token_budget
+
+# An abstract-like paragraph and a markdown summary; REFERENCE_TOKENS is its
+# length under Anthropic's published tokenizer (tokenizer.json)
+SAMPLE = """\
+Diffusion models have recently emerged as a powerful class of generative models, achieving state-of-the-art sample quality on image, audio and video benchmarks. However, sampling from them remains slow: generating a single image typically requires hundreds of sequential network evaluations. In this paper, we propose Adaptive Guidance Schedules (AGS), a training-free method that varies the classifier-free guidance scale over the course of sampling. Our key observation is that strong guidance is only useful during the early, high-noise steps, when the global layout of the image is decided; applying it later mostly adds saturation artifacts. AGS therefore starts with a high guidance scale and decays it according to the estimated signal-to-noise ratio, skipping the unconditional pass entirely once the scale falls below 1.05. On ImageNet 256x256 and MS-COCO, AGS reduces the number of network evaluations by 28% while improving FID from 3.21 to 2.94.
+
+## Key contributions
+
+- **Adaptive schedule:** guidance decays with the estimated SNR, so no per-model tuning is needed.
+- **Cheaper sampling:** the unconditional pass is skipped for roughly the last third of the steps.
+- **Evaluation:** experiments on two datasets (ImageNet, MS-COCO) and three samplers (DDIM, DPM-Solver++, Euler).
+"""
+REFERENCE_TOKENS = 282
+
+def test_count_tokens_is_close_to_reference():
+    assert abs(token_budget.count_tokens(SAMPLE) - REFERENCE_TOKENS) <= 0.15 * REFERENCE_TOKENS
+
+def test_output_budget_keeps_a_full_length_summary():
+    # About 1200 tokens (4,800 characters) of summary fits SUMMARY_OUTPUT_TOKENS=1200
+    summary = (SAMPLE * 4)[:4800]
+    assert token_budget.truncate_to_tokens(summary, 1200) == summary
+
+def test_truncate_prefers_a_paragraph_boundary():
+    truncated = token_budget.truncate_to_tokens(SAMPLE, 250)
+    assert truncated.endswith("Key contributions")
+    assert token_budget.count_tokens(truncated) <= 250
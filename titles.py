@@ -0,0 +1,56 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import List
+
+_NON_WORD = re.compile(r'[^\w\s]+')
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_title(title: str) -> str:
+    """Normalize a paper title for use as a lookup key.
+
+    Case, accents, punctuation and whitespace differences are dropped so that
+    the same paper seen in different alerts maps to the same key.
+    """
+    if not title:
+        return ""
+    title = unicodedata.normalize('NFKD', title)
+    title = "".join(ch for ch in title if not unicodedata.combining(ch))
+    title = _NON_WORD.sub(' ', title.lower())
+    return _WHITESPACE.sub(' ', title).strip()
+
+def title_similarity(a: str, b: str) -> float:
+    """Similarity ratio (0..1) between two titles after normalization."""
+    a, b = normalize_title(a), normalize_title(b)
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+def group_similar_titles(titles: List[str], threshold: float) -> List[List[int]]:
+    """Group titles that refer to the same paper.
+
+    Titles with the same normalized form always share a group; otherwise a
+    title joins the first group whose representative (its first title) is at
+    least `threshold` similar. Returns lists of indices into `titles`, in
+    order of first appearance.
+    """
+    groups = []
+    by_key = {}
+    representatives = []  # (normalized title, group index)
+    for index, title in enumerate(titles):
+        key = normalize_title(title)
+        group = by_key.get(key)
+        if group is None:
+            for representative, candidate in representatives:
+                if title_similarity(key, representative) >= threshold:
+                    group = candidate
+                    break
+        if group is None:
+            group = len(groups)
+            groups.append([])
+            representatives.append((key, group))
+        by_key[key] = group
+        groups[group].append(index)
+    return groups